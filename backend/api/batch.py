@@ -0,0 +1,163 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, transaction
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# Заголовки, которые не должны наследоваться от пакетного запроса:
+# ответы нужны несжатыми и без условных 304.
+DROPPED_META = (
+    'HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'CONTENT_LENGTH', 'CONTENT_TYPE',
+)
+SKIPPED_STATUS = 424
+
+
+def make_request(parent, item):
+    """WSGI-запрос для элемента пакета с пользователем родителя."""
+    path, _, query = item['path'].partition('?')
+    body = b''
+    if 'body' in item:
+        body = json.dumps(item['body']).encode()
+    environ = {
+        key: value for key, value in parent.META.items()
+        if key not in DROPPED_META
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': BytesIO(body),
+    })
+    request = WSGIRequest(environ)
+    # Пользователь уже аутентифицирован пакетным запросом; DRF примет
+    # его без повторной проверки токена.
+    if parent.user.is_authenticated:
+        request._force_auth_user = parent.user
+        request._force_auth_token = parent.auth
+    return request
+
+
+def body_of(response):
+    if response.streaming:
+        return None
+    if hasattr(response, 'data'):
+        return response.data
+    content = response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content) if content else None
+    return content.decode(response.charset or 'utf-8', 'replace')
+
+
+def execute(parent, item):
+    path = item['path'].partition('?')[0]
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {'status': 404, 'body': {'detail': 'Страница не найдена.'}}
+    if match.url_name == 'batch':
+        return {'status': 400, 'body': {'detail': 'Вложенные пакеты.'}}
+    try:
+        response = match.func(
+            make_request(parent, item), *match.args, **match.kwargs
+        )
+    except Exception:
+        logger.exception('Ошибка в запросе пакета %s %s',
+                         item['method'], item['path'])
+        return {'status': 500, 'body': None}
+    return {'status': response.status_code, 'body': body_of(response)}
+
+
+def execute_in_thread(parent, item):
+    # У каждого потока пула своё соединение с БД; обращаемся с ним как
+    # Django с соединением обработчика запроса, с учётом CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        return execute(parent, item)
+    finally:
+        close_old_connections()
+
+
+executor = ThreadPoolExecutor(
+    settings.BATCH_MAX_WORKERS, thread_name_prefix='batch'
+)
+
+
+class Batch:
+    """Выполнение пакета запросов через резолвер URL.
+
+    Чтения между записями выполняются параллельно в общем пуле из
+    ``BATCH_MAX_WORKERS`` потоков, записи — по порядку. Одинаковые
+    GET-запросы выполняются один раз, пока их не разделит запись. В
+    режиме ``atomic`` всё выполняется последовательно в одной
+    транзакции и откатывается при первом ответе с ошибкой; оставшиеся
+    запросы получают статус 424.
+    """
+
+    def __init__(self, request, items):
+        self.request = request
+        self.items = items
+        self.cache = {}
+
+    def run(self, atomic=False):
+        if atomic:
+            with transaction.atomic():
+                results = self.run_sequential()
+                if any(result['status'] >= 400 for result in results):
+                    transaction.set_rollback(True)
+            return results
+        return self.run_concurrent()
+
+    def run_sequential(self):
+        results = []
+        for item in self.items:
+            if results and results[-1]['status'] >= 400:
+                results.append({'status': SKIPPED_STATUS, 'body': None})
+                continue
+            results.append(self.cached(item, execute))
+        return results
+
+    def cached(self, item, func):
+        if item['method'] != 'GET':
+            self.cache.clear()
+            return func(self.request, item)
+        if item['path'] not in self.cache:
+            self.cache[item['path']] = func(self.request, item)
+        return self.cache[item['path']]
+
+    def run_concurrent(self):
+        results = [None] * len(self.items)
+        reads = []
+        for position, item in enumerate(self.items + [None]):
+            if item is not None and item['method'] == 'GET':
+                reads.append(position)
+                continue
+            self.read_all(reads, results)
+            reads = []
+            if item is not None:
+                results[position] = self.cached(item, execute)
+        return results
+
+    def read_all(self, positions, results):
+        futures = {}
+        for position in positions:
+            path = self.items[position]['path']
+            if path in self.cache:
+                continue
+            if path not in futures:
+                futures[path] = executor.submit(
+                    execute_in_thread, self.request, self.items[position]
+                )
+        for path, future in futures.items():
+            self.cache[path] = future.result()
+        for position in positions:
+            results[position] = self.cache[self.items[position]['path']]
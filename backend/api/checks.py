@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые живут внутри процесса: у каждого воркера gunicorn,
+# runworker и uvicorn свой, и после перезапуска они пусты.
+PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def process_cache_errors(feature, check_id):
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_CACHES:
+        return []
+    return [Error(
+        f'{feature} требует общего для всех процессов кэша, '
+        f'а CACHES["default"] — {backend}.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION (memcached есть в '
+             'docker-compose); кэш в памяти процесса годится только '
+             'для разработки и тестов.',
+        id=check_id,
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def throttle_cache_check(app_configs, **kwargs):
+    """Счётчики SlidingWindowThrottle должны быть общими для воркеров.
+
+    В кэше процесса каждый воркер считает свой бюджет, и клиент получает
+    лимит, умноженный на число воркеров, а перезапуск его обнуляет.
+    """
+    throttles = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_CLASSES', ())
+    if 'api.throttling.SlidingWindowThrottle' not in throttles:
+        return []
+    return process_cache_errors('Ограничение частоты запросов', 'api.E001')
+
+
+@register(Tags.caches, deploy=True)
+def fragment_cache_check(app_configs, **kwargs):
+    """Версии фрагментов (api.fragments) должны быть общими для процессов.
+
+    Изменение рецепта в одном процессе (запрос, runworker, сигнал)
+    должно сбрасывать фрагмент во всех, иначе остальные продолжат
+    отдавать старый текст и адреса картинок до истечения
+    FRAGMENT_CACHE_TIMEOUT.
+    """
+    return process_cache_errors('Кэш фрагментов рецептов', 'api.E002')
@@ -0,0 +1,70 @@
+import gzip
+import zlib
+
+import brotli
+from django.conf import settings
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    return ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request):
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    return next(
+        (name for name in available_encodings() if name in accepted), None
+    )
+
+
+def compress(body, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(
+            body, quality=level or settings.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        body, compresslevel=level or settings.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток по кусочкам, сбрасывая сжатое после каждого.
+
+    Клиент получает данные по мере генерации, а в памяти держится только
+    текущий кусок.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    # wbits=31 — формат gzip с заголовком и контрольной суммой.
+    compressor = zlib.compressobj(
+        settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31
+    )
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
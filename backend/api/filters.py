@@ -1,31 +1,134 @@
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.db.models.expressions import RawSQL
 from django_filters import rest_framework as filter
-from recipes.models import Recipe
+from recipes.indexes import pantry_index
+from recipes.models import (Favorite, Recipe, RecipeCard, RecipeTag,
+                            ShoppingCart, Tag)
 from rest_framework.filters import SearchFilter
 
+ORDERINGS = {
+    'trending': ('-trending_score', '-pub_date'),
+}
+
+
+def ids_subquery(ids):
+    """Подзапрос со списком id одним параметром для ``pk__in``.
+
+    Обычный ``pk__in`` передаёт каждый id отдельным параметром: список в
+    сотни тысяч id раздувает запрос и упирается в предел числа
+    переменных SQLite. PostgreSQL получает литерал массива, SQLite — JSON.
+    """
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            'SELECT unnest(%s::bigint[])',
+            ['{' + ','.join(str(pk) for pk in ids) + '}']
+        )
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT value FROM json_each(%s)', [json.dumps(ids)])
+    return ids
+
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
 
 
+class NumberInFilter(filter.BaseInFilter, filter.NumberFilter):
+    pass
+
+
 class RecipeFilter(filter.FilterSet):
-    tags = filter.AllValuesMultipleFilter(
+    tags = filter.ModelMultipleChoiceFilter(
         field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='get_tags',
         label='Tags'
     )
     is_favorited = filter.BooleanFilter(method='get_favorite')
     is_in_shopping_cart = filter.BooleanFilter(
         method='get_is_in_shopping_cart')
+    pantry = NumberInFilter(method='get_pantry', label='Pantry')
+    missing = filter.NumberFilter(
+        method='get_missing',
+        min_value=0,
+        max_value=settings.PANTRY_MAX_MISSING
+    )
+    ordering = filter.ChoiceFilter(
+        choices=[(key, key) for key in ORDERINGS],
+        method='get_ordering'
+    )
+
+    orderings = ORDERINGS
 
     class Meta:
         model = Recipe
         fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
 
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        # EXISTS вместо JOIN: не нужен DISTINCT, и сортировка страницы
+        # может идти по индексу рецептов.
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
+
     def get_favorite(self, queryset, name, value):
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
+        return queryset
+
+    def get_pantry(self, queryset, name, value):
+        """Рецепты, которые можно приготовить из перечисленных ингредиентов.
+
+        ``missing`` допускает нехватку нескольких ингредиентов. Отбор
+        идёт по битовому индексу в памяти, теги сужают его там же.
+        """
+        tags = self.form.cleaned_data.get('tags')
+        recipe_ids = pantry_index.cookable(
+            [int(ingredient) for ingredient in value],
+            int(self.form.cleaned_data.get('missing') or 0),
+            [tag.id for tag in tags] if tags else None
+        )
+        return queryset.filter(pk__in=ids_subquery(recipe_ids.tolist()))
+
+    def get_missing(self, queryset, name, value):
+        # Учитывается в get_pantry.
         return queryset
+
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*self.orderings[value])
+
+
+class RecipeCardFilter(RecipeFilter):
+    """Те же фильтры по таблице карточек RecipeCard.
+
+    Теги отбираются по массиву ``tag_ids`` через GIN-индекс, без
+    подзапроса к RecipeTag.
+    """
+
+    orderings = {
+        'trending': ('-recipe__trending_score', '-pub_date'),
+    }
+
+    class Meta:
+        model = RecipeCard
+        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(tag_ids__overlap=[tag.id for tag in value])
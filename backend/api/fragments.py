@@ -0,0 +1,89 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+
+class FragmentCache:
+    """Кэш независимых от зрителя частей ответа по id объекта.
+
+    Ключ фрагмента включает поколение всего кэша и версию объекта.
+    Изменение объекта записывает ему новую версию, изменение общих
+    данных (тегов, ингредиентов) — новое поколение; старые фрагменты
+    перестают читаться и вытесняются по времени жизни. Версии читаются
+    до запроса к базе, поэтому фрагмент, собранный одновременно с
+    изменением, ложится под старую версию и отдан не будет.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def generation_key(self):
+        return f'{self.name}-fragments:generation'
+
+    def version_key(self, pk):
+        return f'{self.name}-fragments:version:{pk}'
+
+    def keys(self, ids):
+        """Ключи фрагментов текущих версий: {id: ключ}."""
+        version_keys = {self.version_key(pk): pk for pk in ids}
+        versions = cache.get_many([self.generation_key, *version_keys])
+        # Пропавшая версия заменяется новой: старый фрагмент под ней
+        # мог пережить изменение объекта.
+        missing = {
+            key: new_version()
+            for key in [self.generation_key, *version_keys]
+            if key not in versions
+        }
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        generation = versions[self.generation_key]
+        return {
+            pk: f'{self.name}-fragments:{generation}:{pk}:{versions[key]}'
+            for key, pk in version_keys.items()
+        }
+
+    def get_many(self, ids, build, store=True):
+        """Фрагменты объектов ids: {id: фрагмент}.
+
+        Отсутствующие в кэше собирает build(ids) одним вызовом; объекты,
+        которых нет в базе, в ответ не попадают. С ``store=False``
+        собранное в кэш не кладётся: так build может вернуть неполные
+        фрагменты.
+        """
+        if not ids:
+            return {}
+        keys = self.keys(ids)
+        found = cache.get_many(keys.values())
+        fragments = {
+            pk: found[key] for pk, key in keys.items() if key in found
+        }
+        missing = [pk for pk in keys if pk not in fragments]
+        if missing:
+            built = build(missing)
+            if not store:
+                fragments.update(built)
+                return fragments
+            cache.set_many(
+                {keys[pk]: fragment for pk, fragment in built.items()},
+                settings.FRAGMENT_CACHE_TIMEOUT
+            )
+            fragments.update(built)
+        return fragments
+
+    def invalidate(self, ids):
+        cache.set_many(
+            {self.version_key(pk): new_version() for pk in ids}, None
+        )
+
+    def invalidate_all(self):
+        cache.set(self.generation_key, new_version(), None)
+
+
+recipe_fragments = FragmentCache('recipe')
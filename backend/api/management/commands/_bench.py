@@ -0,0 +1,80 @@
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.test import override_settings
+
+
+def summarize(latencies, elapsed=None):
+    """Сводка по задержкам в миллисекундах."""
+    values = np.asarray(latencies, dtype=float) * 1000
+    summary = {'count': int(values.size)}
+    if not values.size:
+        return summary
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    summary.update({
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+    })
+    if elapsed:
+        summary['throughput_rps'] = round(values.size / elapsed, 2)
+    return summary
+
+
+def timeit(func, repeat):
+    """Время каждого из repeat вызовов func в секундах."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def unthrottled():
+    """Настройки с лимитами частоты, которых бенчмарк не достигнет.
+
+    Проверка лимита при этом выполняется, и её цена входит в замеры.
+    """
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework['DEFAULT_THROTTLE_RATES'] = {
+        scope: '1000000/s'
+        for scope in rest_framework.get('DEFAULT_THROTTLE_RATES', {})
+    }
+    return override_settings(REST_FRAMEWORK=rest_framework)
+
+
+def write_report(path, report):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8'
+    )
+
+
+def compare(results, baseline, threshold):
+    """Регрессии относительно базовой линии.
+
+    Регрессией считается рост p95 или падение пропускной способности
+    больше чем на threshold (доля) для любого общего эндпоинта.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not current.get('count'):
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f'{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} мс'
+            )
+        old_rps = previous.get('throughput_rps')
+        new_rps = current.get('throughput_rps')
+        if old_rps and new_rps and new_rps < old_rps * (1 - threshold):
+            regressions.append(
+                f'{name}: throughput {old_rps} -> {new_rps} rps'
+            )
+    return regressions
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from api.compression import available_encodings, compress
+
+from ._bench import summarize, timeit, write_report
+
+LEVELS = {
+    'gzip': (1, 5, 6, 9),
+    'br': (1, 4, 5, 11),
+}
+
+
+def fetch_pages(limit):
+    """Несжатые тела типичных ответов API на засеянной базе."""
+    user = User.objects.filter(follower__isnull=False).first()
+    if user is None:
+        raise CommandError('База пуста: сначала выполните manage.py seed.')
+    token = Token.objects.get_or_create(user=user)[0].key
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    requests = {
+        'recipes:list (limit=6)': (reverse('api:recipes-list'), {}),
+        f'recipes:list (limit={limit})': (
+            reverse('api:recipes-list'), {'limit': limit}
+        ),
+        'users:subscriptions': (
+            reverse('api:subscriptions'), {'recipes_limit': 3}
+        ),
+        'ingredients:search': (
+            reverse('api:ingredients-list'), {'name': 'к'}
+        ),
+    }
+    pages = {}
+    for name, (path, params) in requests.items():
+        response = client.get(path, params)
+        if response.status_code != 200:
+            raise CommandError(f'{name}: статус {response.status_code}')
+        pages[name] = response.content
+    return pages
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение экономии трафика и затрат CPU на сжатие ответов API '
+        'разными кодировками и уровнями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Размер большой страницы списка рецептов.'
+        )
+        parser.add_argument('--output', default='bench_compression.json')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, body in fetch_pages(options['limit']).items():
+            results[name] = {'bytes': len(body), 'encodings': {}}
+            for encoding in available_encodings():
+                for level in LEVELS[encoding]:
+                    compressed = compress(body, encoding, level)
+                    timing = summarize(timeit(
+                        lambda: compress(body, encoding, level),
+                        options['repeat']
+                    ))
+                    results[name]['encodings'][f'{encoding}-{level}'] = {
+                        'bytes': len(compressed),
+                        'saved': round(1 - len(compressed) / len(body), 3),
+                        'p50_ms': timing['p50_ms'],
+                        'mb_per_s': round(
+                            len(body) / 2 ** 20 / timing['p50_ms'] * 1000, 1
+                        ),
+                    }
+        write_report(options['output'], results)
+        for name, result in results.items():
+            self.stdout.write(f'{name}: {result["bytes"]} байт')
+            for variant, summary in result['encodings'].items():
+                self.stdout.write(
+                    f'  {variant:8} {summary["bytes"]:>8} байт  '
+                    f'-{summary["saved"] * 100:.1f}%  '
+                    f'p50 {summary["p50_ms"]:>7} мс  '
+                    f'{summary["mb_per_s"]:>7} МБ/с'
+                )
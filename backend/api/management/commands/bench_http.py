@@ -0,0 +1,325 @@
+import base64
+import io
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.urls import reverse
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from ._bench import compare, summarize, unthrottled, write_report
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@scenario
+def anonymous_feed(rng, ctx):
+    params = {'page': rng.randint(1, 20)}
+    if rng.random() < 0.5:
+        params['tags'] = rng.sample(ctx['tags'], min(2, len(ctx['tags'])))
+    yield 'recipes:list', 'GET', reverse('api:recipes-list'), {
+        'params': params
+    }
+
+
+@scenario
+def authenticated_feed(rng, ctx):
+    params = {'page': rng.randint(1, 5)}
+    choice = rng.random()
+    if choice < 0.2:
+        params['is_favorited'] = 1
+    elif choice < 0.3:
+        params['is_in_shopping_cart'] = 1
+    yield 'recipes:list (auth)', 'GET', reverse('api:recipes-list'), {
+        'params': params, 'auth': True
+    }
+    yield 'recipes:detail (auth)', 'GET', reverse(
+        'api:recipes-detail', args=[rng.choice(ctx['recipes'])]
+    ), {'auth': True}
+
+
+@scenario
+def ingredient_autocomplete(rng, ctx):
+    prefix = rng.choice(ctx['prefixes'])
+    for length in range(1, min(len(prefix), 3) + 1):
+        yield 'ingredients:search', 'GET', reverse('api:ingredients-list'), {
+            'params': {'name': prefix[:length]}
+        }
+
+
+@scenario
+def recipe_create(rng, ctx):
+    payload = {
+        'name': f'Нагрузочный рецепт {rng.randint(1, 10 ** 6)}',
+        'text': 'Создан нагрузочным тестом.',
+        'cooking_time': rng.randint(1, 120),
+        'image': ctx['image'],
+        'tags': rng.sample(ctx['tag_ids'], min(2, len(ctx['tag_ids']))),
+        'ingredients': [
+            {'id': ingredient, 'amount': rng.randint(1, 50)}
+            for ingredient in rng.sample(ctx['ingredients'], 5)
+        ],
+    }
+    yield 'recipes:create', 'POST', reverse('api:recipes-list'), {
+        'json': payload, 'auth': True, 'created': True
+    }
+
+
+@scenario
+def favorite_toggle(rng, ctx):
+    path = reverse(
+        'api:recipes-add-to-favorites', args=[rng.choice(ctx['recipes'])]
+    )
+    yield 'favorite:add', 'POST', path, {'auth': True}
+    yield 'favorite:remove', 'DELETE', path, {'auth': True}
+
+
+@scenario
+def cart_toggle(rng, ctx):
+    path = reverse(
+        'api:recipes-add-to-shopping-cart', args=[rng.choice(ctx['recipes'])]
+    )
+    yield 'shopping_cart:add', 'POST', path, {'auth': True}
+    yield 'shopping_cart:remove', 'DELETE', path, {'auth': True}
+
+
+@scenario
+def cart_download(rng, ctx):
+    yield 'shopping_cart:download', 'GET', reverse(
+        'api:recipes-download-shopping-cart'
+    ), {'auth': True}
+
+
+@scenario
+def subscriptions_page(rng, ctx):
+    yield 'users:subscriptions', 'GET', reverse('api:subscriptions'), {
+        'params': {'recipes_limit': 3}, 'auth': True
+    }
+
+
+def make_image():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((400, 300), 64).convert('RGB').save(
+        buffer, 'JPEG', quality=85
+    )
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный HTTP-бенчмарк API на засеянной базе. Без --url '
+        'поднимает сервер в этом же процессе; для абсолютных цифр '
+        'запускайте gunicorn и передавайте его адрес.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера, например '
+            'http://127.0.0.1:9000. По умолчанию сервер в процессе.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS),
+            help='Сценарий (можно несколько). По умолчанию все.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Число прогонов каждого сценария.'
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько пользователей из базы использовать.'
+        )
+        parser.add_argument('--output', default='bench_http.json')
+        parser.add_argument('--baseline')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Допустимое ухудшение относительно baseline (доля).'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат в --baseline.'
+        )
+
+    def handle(self, *args, **options):
+        ctx = self.build_context(options)
+        server = None
+        base_url = options['url']
+        throttling = unthrottled()
+        if base_url is None:
+            throttling.enable()
+            server, base_url = self.start_server()
+        ctx['base_url'] = base_url.rstrip('/')
+        ctx['headers'] = self.host_header(options['url'])
+        results = {}
+        created = []
+        try:
+            for name in options['scenario'] or sorted(SCENARIOS):
+                self.stdout.write(f'{name}...')
+                results.update(self.run_scenario(
+                    SCENARIOS[name], ctx, options, created
+                ))
+        finally:
+            if server is not None:
+                server.shutdown()
+                throttling.disable()
+            Recipe.objects.filter(id__in=created).delete()
+        report = {
+            'meta': {
+                key: options[key]
+                for key in ('seed', 'concurrency', 'iterations', 'url')
+            },
+            'results': results,
+        }
+        write_report(options['output'], report)
+        for name, summary in sorted(results.items()):
+            self.stdout.write(
+                f'{name:28} {summary.get("throughput_rps", 0):>9} rps  '
+                f'p50 {summary.get("p50_ms", 0):>8}  '
+                f'p95 {summary.get("p95_ms", 0):>8}  '
+                f'p99 {summary.get("p99_ms", 0):>8} мс  '
+                f'{summary["statuses"]}'
+            )
+        self.check_baseline(results, options)
+
+    def check_baseline(self, results, options):
+        baseline_path = options['baseline']
+        if not baseline_path:
+            return
+        if options['save_baseline']:
+            write_report(baseline_path, {'results': results})
+            self.stdout.write(f'Базовая линия сохранена в {baseline_path}')
+            return
+        baseline = json.loads(Path(baseline_path).read_text())['results']
+        regressions = compare(results, baseline, options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def build_context(self, options):
+        recipes = list(
+            Recipe.objects.order_by('-pub_date').values_list(
+                'id', flat=True
+            )[:10000]
+        )
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        users = list(User.objects.filter(
+            is_staff=False, recipes__isnull=False
+        ).distinct().order_by('id')[:options['users']])
+        if not recipes or not users or len(ingredients) < 5:
+            raise CommandError(
+                'База пуста: сначала выполните manage.py seed.'
+            )
+        return {
+            'recipes': recipes,
+            'ingredients': ingredients,
+            'tags': list(Tag.objects.values_list('slug', flat=True)),
+            'tag_ids': list(Tag.objects.values_list('id', flat=True)),
+            'prefixes': list(
+                Ingredient.objects.values_list('name', flat=True)[:500]
+            ),
+            'tokens': [
+                Token.objects.get_or_create(user=user)[0].key
+                for user in users
+            ],
+            'image': make_image(),
+        }
+
+    @staticmethod
+    def host_header(url):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        if url or not hosts:
+            return {}
+        return {'Host': hosts[0].lstrip('.')}
+
+    @staticmethod
+    def start_server():
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.set_app(get_internal_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f'http://127.0.0.1:{server.server_port}'
+
+    def run_scenario(self, func, ctx, options, created):
+        latencies = defaultdict(list)
+        statuses = defaultdict(Counter)
+        lock = threading.Lock()
+
+        def worker(number, iterations, record):
+            rng = random.Random(options['seed'] * 1000 + number)
+            session = requests.Session()
+            session.headers.update(ctx['headers'])
+            token = ctx['tokens'][number % len(ctx['tokens'])]
+            for _ in range(number, iterations, options['concurrency']):
+                for name, method, path, kwargs in func(rng, ctx):
+                    kwargs = dict(kwargs)
+                    headers = {}
+                    if kwargs.pop('auth', False):
+                        headers['Authorization'] = f'Token {token}'
+                    track = kwargs.pop('created', False)
+                    started = time.perf_counter()
+                    response = session.request(
+                        method, ctx['base_url'] + path, headers=headers,
+                        **kwargs
+                    )
+                    elapsed = time.perf_counter() - started
+                    if track and response.status_code == 201:
+                        created.append(response.json()['id'])
+                    if not record:
+                        continue
+                    with lock:
+                        latencies[name].append(elapsed)
+                        statuses[name][response.status_code] += 1
+
+        def run(iterations, record):
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                list(executor.map(
+                    lambda number: worker(number, iterations, record),
+                    range(options['concurrency'])
+                ))
+
+        run(options['warmup'], False)
+        started = time.perf_counter()
+        run(options['iterations'], True)
+        elapsed = time.perf_counter() - started
+        return {
+            name: {
+                **summarize(values, elapsed),
+                'statuses': {
+                    str(code): count
+                    for code, count in sorted(statuses[name].items())
+                },
+            }
+            for name, values in latencies.items()
+        }
@@ -0,0 +1,99 @@
+import io
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from recipes.models import Recipe
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import RecipeSerializer
+
+from ._bench import summarize, timeit, write_report
+from .bench_http import make_image
+
+
+def recipe_page(size):
+    request = Request(RequestFactory().get('/api/recipes/'))
+    recipes = Recipe.objects.select_related('author').prefetch_related(
+        'tags'
+    )[:size]
+    if not recipes:
+        raise CommandError('База пуста: сначала выполните manage.py seed.')
+    return {
+        'count': size,
+        'next': None,
+        'previous': None,
+        'results': RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data,
+    }
+
+
+def upload_body():
+    return json.dumps({
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': make_image(),
+        'tags': [1, 2],
+        'ingredients': [{'id': 1, 'amount': 10}, {'id': 2, 'amount': 5}],
+    }).encode()
+
+
+class Command(BaseCommand):
+    help = 'Сравнение скорости стандартных и orjson рендерера и парсера DRF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--output', default='bench_json.json')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson не установлен.')
+        page = recipe_page(options['page_size'])
+        body = upload_body()
+        expected = JSONRenderer().render(page)
+        if ORJSONRenderer().render(page) != expected:
+            raise CommandError('Вывод рендереров различается.')
+        cases = {
+            'render': (
+                len(expected),
+                {
+                    'json': lambda: JSONRenderer().render(page),
+                    'orjson': lambda: ORJSONRenderer().render(page),
+                },
+            ),
+            'parse': (
+                len(body),
+                {
+                    'json': lambda: JSONParser().parse(io.BytesIO(body)),
+                    'orjson': lambda: ORJSONParser().parse(io.BytesIO(body)),
+                },
+            ),
+        }
+        report = {}
+        for case, (size, funcs) in cases.items():
+            report[case] = {'bytes': size}
+            for name, func in funcs.items():
+                summary = summarize(timeit(func, options['repeat']))
+                summary['mb_per_s'] = round(
+                    size / 2 ** 20 / summary['p50_ms'] * 1000, 1
+                )
+                report[case][name] = summary
+            report[case]['speedup_p50'] = round(
+                report[case]['json']['p50_ms']
+                / report[case]['orjson']['p50_ms'], 1
+            )
+        write_report(options['output'], report)
+        for case, result in report.items():
+            self.stdout.write(
+                f'{case} ({result["bytes"]} байт): '
+                f'json p50 {result["json"]["p50_ms"]} мс, '
+                f'orjson p50 {result["orjson"]["p50_ms"]} мс, '
+                f'x{result["speedup_p50"]}'
+            )
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from recipes.indexes import similarity_index
+from recipes.models import Recipe, RecipeIngredient
+
+from ._bench import summarize, timeit, write_report
+
+
+def naive_similar(recipe_id, limit):
+    """Похожие рецепты самосоединением RecipeIngredient в SQL."""
+    return list(
+        RecipeIngredient.objects.filter(
+            ingredient__in=RecipeIngredient.objects.filter(
+                recipe_id=recipe_id
+            ).values('ingredient')
+        ).exclude(recipe_id=recipe_id).values('recipe_id').annotate(
+            shared=Count('id')
+        ).order_by('-shared', '-recipe_id')[:limit]
+    )
+
+
+class Command(BaseCommand):
+    help = 'Сравнение индекса похожих рецептов с наивным SQL-запросом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='bench_similar.json')
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        if not recipe_ids:
+            raise CommandError('База пуста: сначала выполните manage.py seed.')
+        sample = random.Random(options['seed']).sample(
+            recipe_ids, min(options['queries'], len(recipe_ids))
+        )
+        started = time.perf_counter()
+        similarity_index.ensure()
+        build = time.perf_counter() - started
+        queries = iter(sample)
+        index = timeit(
+            lambda: similarity_index.similar(next(queries), options['limit']),
+            len(sample)
+        )
+        queries = iter(sample)
+        naive = timeit(
+            lambda: naive_similar(next(queries), options['limit']),
+            len(sample)
+        )
+        report = {
+            'recipes': len(recipe_ids),
+            'index_build_s': round(build, 3),
+            'index': summarize(index),
+            'naive_sql': summarize(naive),
+        }
+        report['speedup_p50'] = round(
+            report['naive_sql']['p50_ms'] / report['index']['p50_ms'], 1
+        )
+        write_report(options['output'], report)
+        self.stdout.write(
+            f'{report["recipes"]} рецептов, построение индекса '
+            f'{report["index_build_s"]} с\n'
+            f'индекс:    p50 {report["index"]["p50_ms"]} мс, '
+            f'p95 {report["index"]["p95_ms"]} мс\n'
+            f'наивный SQL: p50 {report["naive_sql"]["p50_ms"]} мс, '
+            f'p95 {report["naive_sql"]["p95_ms"]} мс\n'
+            f'ускорение по p50: x{report["speedup_p50"]}'
+        )
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import re
+import resource
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from events.bus import publish
+
+from ._bench import summarize, write_report
+
+# События бенчмарка несут отрицательный id, которого нет у рецептов.
+MARKER = re.compile(rb'"ids":\[-(\d+)\]')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_stats(pid):
+    """Память (КБ) и процессорное время (с) процесса по /proc."""
+    with open(f'/proc/{pid}/status') as status:
+        rss = next(
+            int(line.split()[1]) for line in status
+            if line.startswith('VmRSS:')
+        )
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return rss, cpu
+
+
+class Client:
+    """Подключение к потоку событий: время получения каждого события."""
+
+    def __init__(self):
+        self.received = {}
+        self.reader = self.writer = None
+
+    async def connect(self, host, port, path):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+            'Accept: text/event-stream\r\n\r\n'.encode()
+        )
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 200'):
+            raise ConnectionError(head.split(b'\r\n', 1)[0].decode())
+        await self.reader.readuntil(b'\n\n')
+
+    async def listen(self):
+        while True:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                return
+            now = time.perf_counter()
+            for match in MARKER.finditer(chunk):
+                self.received[int(match.group(1))] = now
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест потока событий: тысячи простаивающих '
+        'подключений, их цена для сервера и задержка доставки событий'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--events', type=int, default=20)
+        parser.add_argument(
+            '--interval', type=float, default=0.2,
+            help='Пауза между событиями, секунды.'
+        )
+        parser.add_argument(
+            '--idle', type=float, default=10,
+            help='Сколько секунд держать подключения без событий.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10,
+            help='Сколько ждать доставки последнего события, секунды.'
+        )
+        parser.add_argument('--connect-concurrency', type=int, default=100)
+        parser.add_argument(
+            '--url',
+            help='Запущенный ASGI-сервер; без него uvicorn поднимается '
+                 'отдельным процессом.'
+        )
+        parser.add_argument('--output', default='bench_sse.json')
+
+    def handle(self, *args, **options):
+        # Каждое подключение — дескриптор и у клиента, и у сервера.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        if options['connections'] + 100 > hard:
+            raise CommandError(
+                f'Лимит открытых файлов {hard} меньше числа подключений.'
+            )
+        server = None
+        url = options['url']
+        if url is None:
+            server, url = self.start_server()
+        try:
+            report = asyncio.run(self.run(url, server, options))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        report['meta'] = {
+            key: options[key]
+            for key in ('connections', 'events', 'interval', 'idle', 'url')
+        }
+        write_report(options['output'], report)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def start_server(self):
+        port = free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'uvicorn',
+                'foodgram_backend.asgi:application',
+                '--port', str(port), '--log-level', 'warning',
+                '--timeout-graceful-shutdown', '1',
+            ],
+            cwd=settings.BASE_DIR,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            server.kill()
+            raise CommandError('uvicorn не запустился.')
+        return server, f'http://127.0.0.1:{port}'
+
+    async def run(self, url, server, options):
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        report = {}
+        if server is not None:
+            rss_before, _ = process_stats(server.pid)
+        clients = [Client() for _ in range(options['connections'])]
+        report['connect'] = await self.connect(clients, host, port, options)
+        listeners = [
+            asyncio.ensure_future(client.listen()) for client in clients
+        ]
+        if server is not None:
+            rss, cpu_before = process_stats(server.pid)
+        await asyncio.sleep(options['idle'])
+        if server is not None:
+            _, cpu_after = process_stats(server.pid)
+            report['server'] = {
+                'rss_before_kb': rss_before,
+                'rss_connected_kb': rss,
+                'kb_per_connection': round(
+                    (rss - rss_before) / len(clients), 2
+                ),
+                'idle_cpu_percent': round(
+                    (cpu_after - cpu_before) / options['idle'] * 100, 2
+                ),
+            }
+        report.update(await self.deliver(clients, options))
+        for client in clients:
+            client.close()
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        return report
+
+    async def connect(self, clients, host, port, options):
+        semaphore = asyncio.Semaphore(options['connect_concurrency'])
+        latencies = []
+
+        async def connect(client):
+            async with semaphore:
+                started = time.perf_counter()
+                await client.connect(host, port, settings.EVENTS_PATH)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(client) for client in clients))
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def deliver(self, clients, options):
+        """Задержки от публикации события до получения клиентами."""
+        sent = {}
+        for number in range(1, options['events'] + 1):
+            sent[number] = time.perf_counter()
+            await sync_to_async(publish)({
+                'type': 'recipe.updated', 'ids': [-number]
+            })
+            await asyncio.sleep(options['interval'])
+        # Ожидание, пока последнее событие дойдёт до всех подключений.
+        deadline = time.perf_counter() + options['timeout']
+        while time.perf_counter() < deadline and not all(
+            number in client.received for client in clients
+        ):
+            await asyncio.sleep(0.1)
+        deliveries, fanout, lost = [], [], 0
+        for number, published in sent.items():
+            times = [
+                client.received[number] - published
+                for client in clients if number in client.received
+            ]
+            lost += len(clients) - len(times)
+            deliveries.extend(times)
+            if times:
+                fanout.append(max(times))
+        return {
+            'delivery': summarize(deliveries),
+            'fanout': summarize(fanout),
+            'lost': lost,
+        }
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from api.throttling import SlidingWindowThrottle
+from api.views import TagViewSet
+
+from ._bench import summarize, timeit, unthrottled, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Цена проверки лимита частоты запросов: отдельно и в составе '
+        'дешёвого запроса к API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000)
+        parser.add_argument('--output', default='bench_throttle.json')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        factory = RequestFactory()
+        views = {
+            'without': TagViewSet.as_view(
+                {'get': 'list'}, throttle_classes=()
+            ),
+            'with': TagViewSet.as_view(
+                {'get': 'list'}, throttle_classes=(SlidingWindowThrottle,)
+            ),
+        }
+        with unthrottled():
+            request = Request(factory.get('/api/tags/'))
+            check = timeit(
+                lambda: SlidingWindowThrottle().allow_request(
+                    request, APIView()
+                ),
+                repeat
+            )
+            # Прогрев: первый запрос собирает ответ со справочником.
+            for view in views.values():
+                view(factory.get('/api/tags/'))
+            requests = {
+                name: timeit(
+                    lambda: view(factory.get('/api/tags/')), repeat
+                )
+                for name, view in views.items()
+            }
+        report = {
+            'cache': settings.CACHES['default']['BACKEND'],
+            'check': summarize(check),
+            'request_without_throttle': summarize(requests['without']),
+            'request_with_throttle': summarize(requests['with']),
+        }
+        report['overhead_p50_ms'] = round(
+            report['request_with_throttle']['p50_ms']
+            - report['request_without_throttle']['p50_ms'], 3
+        )
+        write_report(options['output'], report)
+        self.stdout.write(
+            f'кэш {report["cache"]}\n'
+            f'проверка лимита: p50 {report["check"]["p50_ms"]} мс, '
+            f'p99 {report["check"]["p99_ms"]} мс\n'
+            f'GET /api/tags/ без лимита: p50 '
+            f'{report["request_without_throttle"]["p50_ms"]} мс, '
+            f'с лимитом: p50 {report["request_with_throttle"]["p50_ms"]} мс'
+            f' (+{report["overhead_p50_ms"]} мс)'
+        )
@@ -0,0 +1,457 @@
+import difflib
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Exists, OuterRef, UniqueConstraint
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from recipes.models import (DeletedRecipe, Favorite, FeedEntry, Recipe,
+                            RecipeCard, RecipeIngredient, RecipeTag,
+                            ShoppingCart)
+from recipes.sync import Cursor
+from rest_framework.authtoken.models import Token
+from users.models import Subscription, User
+
+# Таблицы, которые растут вместе с числом пользователей и рецептов;
+# большими считаются те из них, где уже много строк.
+BIG_MODELS = (
+    Recipe, RecipeIngredient, RecipeTag, Favorite, ShoppingCart, FeedEntry,
+    RecipeCard, DeletedRecipe, User, Subscription,
+)
+LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?![\w"])')
+VALUES = re.compile(r'\(\?(?:, \?)+\)')
+ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+# Так psycopg2 записывает запросы серверных курсоров (QuerySet.iterator).
+DECLARE = re.compile(
+    r'^DECLARE "\w+" (?:NO SCROLL )?CURSOR WITH(?:OUT)? HOLD FOR '
+)
+SQLITE_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+# Узлы распараллеливания зависят от числа воркеров сервера, а не от
+# запроса.
+PARALLEL_NODES = ('Gather', 'Gather Merge')
+
+CASES = {}
+
+
+def case(indexes=(), scans=()):
+    """Регистрирует проверяемый эндпоинт.
+
+    Функция получает контекст и возвращает путь, параметры и признак
+    запроса с токеном. ``indexes`` — индексы, которые должен
+    использовать хотя бы один запрос эндпоинта (кортеж — любой из
+    индексов: планировщики PostgreSQL и SQLite выбирают по-разному),
+    ``scans`` — большие таблицы, полный просмотр которых ожидаем.
+    """
+    def register(func):
+        CASES[func.__name__] = (
+            func,
+            [(index,) if isinstance(index, str) else index
+             for index in indexes],
+            set(scans),
+        )
+        return func
+    return register
+
+
+@case(indexes=['recipe_pub_date_idx'])
+def recipes(ctx):
+    return reverse('api:recipes-list'), {}, False
+
+
+@case(indexes=['recipe_pub_date_idx'])
+def recipes_deep_page(ctx):
+    return reverse('api:recipes-list'), {'page': 50}, False
+
+
+@case(indexes=['recipe_pub_date_idx'])
+def recipes_by_tags(ctx):
+    return reverse('api:recipes-list'), {
+        'tags': ['breakfast', 'dessert']
+    }, False
+
+
+@case(indexes=['recipe_trending_idx'])
+def recipes_trending(ctx):
+    return reverse('api:recipes-list'), {'ordering': 'trending'}, False
+
+
+@case()
+def recipes_by_author(ctx):
+    return reverse('api:recipes-list'), {'author': ctx['author']}, False
+
+
+@case(indexes=[
+    ('user_favorite_unique', 'recipes_favorite_user_id_dd4f6854')
+])
+def recipes_favorited(ctx):
+    return reverse('api:recipes-list'), {'is_favorited': 1}, True
+
+
+@case(indexes=[
+    ('user_shoppingcart_unique', 'recipes_shoppingcart_user_id_9cf94f11')
+])
+def recipes_in_shopping_cart(ctx):
+    return reverse('api:recipes-list'), {'is_in_shopping_cart': 1}, True
+
+
+@case()
+def recipe_detail(ctx):
+    return reverse('api:recipes-detail', args=[ctx['recipe']]), {}, True
+
+
+@case(indexes=[
+    'feed_user_pub_date_idx',
+    ('recipe_not_fanned_out_idx', 'recipes_recipe_author_id_7274f74b'),
+])
+def feed(ctx):
+    return reverse('api:recipes-feed'), {}, True
+
+
+# Пачка синхронизации — сотни рецептов, авторов к ним планировщик
+# соединяет хешем по всей таблице пользователей.
+@case(indexes=['recipe_updated_at_idx'], scans=['users_user'])
+def changes(ctx):
+    return reverse('api:recipes-changes'), {'cursor': ctx['cursor']}, False
+
+
+@case(indexes=[
+    ('user_shoppingcart_unique', 'recipes_shoppingcart_user_id_9cf94f11')
+])
+def download_shopping_cart(ctx):
+    return reverse('api:recipes-download-shopping-cart'), {}, True
+
+
+@case(indexes=['user_author_unique'])
+def subscriptions(ctx):
+    return reverse('api:subscriptions'), {'recipes_limit': 3}, True
+
+
+# SQLite читает пользователей в порядке rowid до LIMIT и показывает
+# это как полный просмотр.
+@case(scans=['users_user'])
+def users(ctx):
+    return reverse('api:users-list'), {}, True
+
+
+def shape(sql):
+    """SQL без значений параметров и без списка столбцов SELECT."""
+    sql = VALUES.sub('(...)', NUMBER.sub('?', LITERAL.sub('?', sql)))
+    if not sql.startswith('SELECT '):
+        return sql
+    depth = 0
+    for position, char in enumerate(sql):
+        depth += (char == '(') - (char == ')')
+        if depth == 0 and sql.startswith(' FROM ', position):
+            return 'SELECT ...' + sql[position:]
+    return sql
+
+
+def postgresql_plan(cursor, sql):
+    """Узлы плана: (глубина, описание, таблица, индекс, полный просмотр)."""
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+    nodes = []
+
+    def walk(node, depth):
+        if node['Node Type'] in PARALLEL_NODES:
+            depth -= 1
+        else:
+            relation = node.get('Relation Name')
+            index = node.get('Index Name')
+            parts = [node['Node Type']]
+            if node.get('Scan Direction') == 'Backward':
+                parts.append('Backward')
+            if index:
+                parts.append(f'using {index}')
+            if relation:
+                parts.append(f'on {relation}')
+            nodes.append((
+                depth, ' '.join(parts), relation, index,
+                node['Node Type'] == 'Seq Scan'
+            ))
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(cursor.fetchone()[0][0]['Plan'], 0)
+    return nodes
+
+
+def sqlite_indexes(cursor):
+    """Таблица и имя каждого индекса SQLite.
+
+    Уникальные ограничения SQLite создаёт безымянными индексами
+    (sqlite_autoindex_...), им возвращаются имена ограничений моделей,
+    как в PostgreSQL.
+    """
+    constraints = {}
+    for model in apps.get_models():
+        for constraint in model._meta.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                constraints[model._meta.db_table, tuple(
+                    model._meta.get_field(field).column
+                    for field in constraint.fields
+                )] = constraint.name
+    cursor.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'"
+    )
+    indexes = {}
+    for name, table in cursor.fetchall():
+        cursor.execute(f'PRAGMA index_info("{name}")')
+        columns = tuple(column for _, _, column in cursor.fetchall())
+        indexes[name] = table, constraints.get((table, columns), name)
+    return indexes
+
+
+def sqlite_plan(cursor, sql):
+    """То же для SQLite по EXPLAIN QUERY PLAN.
+
+    SQLite называет таблицы псевдонимами запроса (U0, T3), они
+    заменяются именами таблиц. Подзапросы Django повторяют псевдонимы,
+    поэтому таблица определяется по индексу, а без него псевдоним
+    раскрывается во все подходящие таблицы через ``|``.
+    """
+    aliases = {}
+    for table, alias in ALIAS.findall(sql):
+        aliases.setdefault(alias, set()).add(table)
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    rows = cursor.fetchall()
+    indexes = sqlite_indexes(cursor)
+    depths, nodes = {0: -1}, []
+    for node_id, parent, _, detail in rows:
+        depth = depths[node_id] = depths.get(parent, -1) + 1
+        relation = index = None
+        match = SQLITE_INDEX.search(detail)
+        if match:
+            relation, index = indexes[match.group(1)]
+            detail = detail.replace(match.group(1), index, 1)
+        words = detail.replace(' TABLE ', ' ', 1).split(' ')
+        if words[0] in ('SCAN', 'SEARCH') and len(words) > 1:
+            relation = words[1] = relation or '|'.join(
+                sorted(aliases.get(words[1], [words[1]]))
+            )
+        nodes.append((
+            depth, ' '.join(words), relation, index,
+            words[0] == 'SCAN' and ' USING ' not in detail
+        ))
+    return nodes
+
+
+def explain(sql):
+    plan = {
+        'postgresql': postgresql_plan,
+        'sqlite': sqlite_plan,
+    }.get(connection.vendor)
+    if plan is None:
+        raise CommandError(
+            f'Планы запросов {connection.vendor} не поддерживаются.'
+        )
+    with connection.cursor() as cursor:
+        return plan(cursor, sql)
+
+
+class Command(BaseCommand):
+    help = (
+        'Планы запросов ключевых эндпоинтов на большой базе: полные '
+        'просмотры больших таблиц, используемые индексы и отличия от '
+        'сохранённого снимка'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--snapshots', default=Path(settings.BASE_DIR) / 'query_plans',
+            help='Каталог снимков, по файлу на СУБД.'
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Записать текущие планы в снимок.'
+        )
+        parser.add_argument(
+            '--seed-users', type=int,
+            help='Засеять пустую базу командой seed с этим числом '
+                 'пользователей и собрать ленты.'
+        )
+        parser.add_argument(
+            '--big-table-rows', type=int, default=10000,
+            help='С какого числа строк полный просмотр таблицы — ошибка. '
+                 'Маленькие таблицы планировщик и должен читать целиком, '
+                 'поэтому рецептов нужно не меньше.'
+        )
+        parser.add_argument(
+            'cases', nargs='*',
+            help=f'Проверить только эти эндпоинты: {", ".join(CASES)}.'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['cases']) - set(CASES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}.'
+            )
+        if options['update'] and options['cases']:
+            raise CommandError('Снимок записывается только целиком.')
+        if options['seed_users'] and not Recipe.objects.exists():
+            call_command(
+                'seed', seed=0, users=options['seed_users'],
+                stdout=self.stdout
+            )
+            call_command('rebuild_feed', stdout=self.stdout)
+        sizes = {
+            model._meta.db_table: model.objects.count()
+            for model in BIG_MODELS
+        }
+        if sizes[Recipe._meta.db_table] < options['big_table_rows']:
+            raise CommandError(
+                f'В базе {sizes[Recipe._meta.db_table]} рецептов, нужно '
+                f'не меньше {options["big_table_rows"]}: засейте её '
+                'командой seed или с --seed-users.'
+            )
+        big_tables = {
+            table for table, size in sizes.items()
+            if size >= options['big_table_rows']
+        }
+        # Токен создаётся до ANALYZE, иначе статистика первого прогона
+        # другая.
+        ctx = self.context()
+        self.analyze()
+        report, problems = [], []
+        for name in options['cases'] or CASES:
+            func, indexes, scans = CASES[name]
+            path, params, auth = func(ctx)
+            queries = self.capture(
+                path, params, ctx['token'] if auth else None
+            )
+            report.append(self.describe(name, path, queries))
+            problems.extend(self.violations(
+                name, queries, indexes, big_tables - scans
+            ))
+        snapshot = Path(options['snapshots']) / f'{connection.vendor}.txt'
+        text = '\n'.join(report)
+        if options['update']:
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            snapshot.write_text(text, encoding='utf-8')
+            self.stdout.write(f'Снимок записан: {snapshot}')
+        elif options['cases']:
+            self.stdout.write(text)
+        else:
+            problems.extend(self.compare(snapshot, text))
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f'Проблем в планах: {len(problems)}.')
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке.'))
+
+    @staticmethod
+    def analyze():
+        """Обновляет статистику планировщика.
+
+        ANALYZE в PostgreSQL читает случайную выборку строк, и от запуска
+        к запуску планы с близкой стоимостью менялись бы местами. С
+        большой выборкой таблицы засеянной базы читаются целиком, и
+        статистика одна и та же. VACUUM заполняет карту видимости: без
+        неё COUNT(*) сразу после засева читает таблицу, а не индекс.
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                cursor.execute('ANALYZE')
+                return
+            cursor.execute('SET default_statistics_target = 10000')
+            cursor.execute('VACUUM ANALYZE')
+            cursor.execute('RESET default_statistics_target')
+
+    def context(self):
+        viewer = User.objects.filter(
+            Exists(Favorite.objects.filter(user=OuterRef('pk'))),
+            Exists(ShoppingCart.objects.filter(user=OuterRef('pk'))),
+            Exists(Subscription.objects.filter(user=OuterRef('pk'))),
+        ).order_by('pk').first()
+        if viewer is None:
+            raise CommandError(
+                'Нет пользователя с избранным, списком покупок и '
+                'подписками.'
+            )
+        recipe = Recipe.objects.order_by('pk').values(
+            'pk', 'author_id'
+        ).first()
+        since = timezone.now() - timedelta(days=1)
+        return {
+            'token': Token.objects.get_or_create(user=viewer)[0].key,
+            'recipe': recipe['pk'],
+            'author': recipe['author_id'],
+            'cursor': Cursor(since, (since, None)).encode(),
+        }
+
+    @staticmethod
+    def capture(path, params, token):
+        """SELECT-запросы эндпоинта и их планы без повторов.
+
+        Кэш отключён, чтобы ответ собирался из базы.
+        """
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        with override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }},
+            ALLOWED_HOSTS=['testserver'],
+        ), CaptureQueriesContext(connection) as captured:
+            response = Client().get(path, params, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: ответ {response.status_code}.')
+        queries = {}
+        for query in captured.captured_queries:
+            sql = DECLARE.sub('', query['sql'])
+            if sql.startswith(('SELECT', 'WITH')):
+                plan = explain(sql)
+                queries.setdefault((shape(sql), repr(plan)), plan)
+        return queries
+
+    @staticmethod
+    def describe(name, path, queries):
+        lines = [f'## {name}: GET {NUMBER.sub("?", path)}']
+        for number, ((sql, _), plan) in enumerate(queries.items(), 1):
+            lines.append(f'# {number} {sql}')
+            lines.extend(
+                '  ' * depth + text for depth, text, *_ in plan
+            )
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def violations(name, queries, indexes, big_tables):
+        used = set()
+        for number, plan in enumerate(queries.values(), 1):
+            for _, text, relation, index, full_scan in plan:
+                used.add(index)
+                if full_scan and big_tables & set(relation.split('|')):
+                    yield (
+                        f'{name}: полный просмотр {relation} в запросе '
+                        f'{number} ({text}).'
+                    )
+        for alternatives in indexes:
+            if used.isdisjoint(alternatives):
+                yield (
+                    f'{name}: не используется индекс '
+                    f'{" или ".join(alternatives)}.'
+                )
+
+    def compare(self, snapshot, text):
+        if not snapshot.exists():
+            yield f'Нет снимка {snapshot}, запишите его с --update.'
+            return
+        saved = snapshot.read_text(encoding='utf-8')
+        if saved == text:
+            return
+        for line in difflib.unified_diff(
+            saved.splitlines(keepends=True), text.splitlines(keepends=True),
+            fromfile=str(snapshot), tofile='текущие планы'
+        ):
+            self.stdout.write(line, ending='')
+        yield f'Планы отличаются от снимка {snapshot}.'
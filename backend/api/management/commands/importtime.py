@@ -0,0 +1,152 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ._bench import write_report
+
+STARTUP_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+from foodgram_backend.wsgi import application
+loaded = time.perf_counter() - started
+warm_up = {}
+if WARMUP:
+    from api.warmup import warm_up as run
+    warm_up = run()
+print(json.dumps({'load_s': round(loaded, 3), 'warm_up_s': warm_up}))
+'''
+
+
+def parse_importtime(output):
+    """Собственное время импорта модулей в мс из вывода -X importtime."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(own) / 1000
+    return modules
+
+
+def by_package(modules):
+    packages = defaultdict(float)
+    for name, own in modules.items():
+        packages[name.split('.')[0]] += own
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        'Отчёт о времени холодного запуска: загрузка WSGI-приложения в '
+        'новом процессе, время импорта по пакетам и прогрев.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Число запусков; берётся медиана.'
+        )
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument(
+            '--warmup', action='store_true',
+            help='Выполнить и замерить прогрев, как в gunicorn.'
+        )
+        parser.add_argument('--output', default='importtime.json')
+        parser.add_argument('--baseline')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Допустимый рост времени импорта (доля).'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат в --baseline.'
+        )
+
+    def run_once(self, warmup):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                f'WARMUP = {warmup}\n' + STARTUP_SCRIPT
+            ],
+            capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result['process_s'] = elapsed
+        return result, parse_importtime(process.stderr)
+
+    def handle(self, *args, **options):
+        runs = [
+            self.run_once(options['warmup'])
+            for _ in range(options['repeat'])
+        ]
+        packages = defaultdict(list)
+        for _, modules in runs:
+            for name, own in by_package(modules).items():
+                packages[name].append(own)
+        packages = {
+            name: round(statistics.median(values), 1)
+            for name, values in packages.items()
+        }
+        modules = runs[len(runs) // 2][1]
+        report = {
+            'process_s': round(statistics.median(
+                result['process_s'] for result, _ in runs
+            ), 3),
+            'load_s': statistics.median(
+                result['load_s'] for result, _ in runs
+            ),
+            'warm_up_s': runs[-1][0]['warm_up_s'],
+            'imports_ms': round(sum(packages.values()), 1),
+            'modules': len(modules),
+            'packages_ms': dict(sorted(
+                packages.items(), key=lambda item: -item[1]
+            )),
+            'slowest_modules_ms': dict(sorted(
+                modules.items(), key=lambda item: -item[1]
+            )[:options['top']]),
+        }
+        write_report(options['output'], report)
+        self.stdout.write(
+            f'процесс {report["process_s"]} с, загрузка приложения '
+            f'{report["load_s"]} с, импорт {report["imports_ms"]} мс '
+            f'({report["modules"]} модулей)'
+        )
+        if report['warm_up_s']:
+            self.stdout.write(f'прогрев: {report["warm_up_s"]}')
+        for name, own in list(report['packages_ms'].items())[
+            :options['top']
+        ]:
+            self.stdout.write(f'{name:32} {own:>8} мс')
+        self.check_baseline(report, options)
+
+    def check_baseline(self, report, options):
+        baseline_path = options['baseline']
+        if not baseline_path:
+            return
+        if options['save_baseline']:
+            write_report(baseline_path, report)
+            self.stdout.write(f'Базовая линия сохранена в {baseline_path}')
+            return
+        baseline = json.loads(Path(baseline_path).read_text())
+        limit = baseline['imports_ms'] * (1 + options['threshold'])
+        if report['imports_ms'] > limit:
+            grown = [
+                f'{name}: {baseline["packages_ms"].get(name, 0)} -> {own} мс'
+                for name, own in report['packages_ms'].items()
+                if own - baseline['packages_ms'].get(name, 0) >= 5
+            ]
+            raise CommandError(
+                f'Импорт замедлился: {baseline["imports_ms"]} -> '
+                f'{report["imports_ms"]} мс\n' + '\n'.join(grown)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_encoding, compress, compress_stream
+
+
+class CompressionMiddleware:
+    """Сжатие ответов API в br или gzip по Accept-Encoding.
+
+    Сжимаются ответы под ``COMPRESSION_PATH_PREFIX`` длиннее
+    ``COMPRESSION_MIN_SIZE`` байт; потоковые ответы сжимаются по мере
+    генерации, без буферизации. Уже сжатые ответы не трогаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(settings.COMPRESSION_PATH_PREFIX):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        # Сжатое представление не побайтно равно исходному, поэтому
+        # сильный ETag становится слабым, как в GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            response.content = compress(response.content, encoding)
+            response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        return response
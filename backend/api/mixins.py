@@ -0,0 +1,41 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def parse_ids(value):
+    """Список id без повторов в исходном порядке."""
+    try:
+        ids = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValidationError({'ids': 'Ожидается список целых чисел.'})
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.MULTI_GET_MAX_IDS:
+        raise ValidationError({
+            'ids': f'Не больше {settings.MULTI_GET_MAX_IDS} id за запрос.'
+        })
+    return ids
+
+
+class MultiGetMixin:
+    """Получение нескольких объектов списком ``?ids=1,2,3``.
+
+    Объекты загружаются одним запросом через ``get_queryset``, поэтому
+    подгрузка связанных данных та же, что у страницы списка. Фильтры и
+    пагинация не применяются; порядок — как в запросе, ненайденные id
+    перечисляются в ``missing``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        value = request.query_params.get('ids')
+        if value is None:
+            return super().list(request, *args, **kwargs)
+        ids = parse_ids(value)
+        objects = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [objects[pk] for pk in ids if pk in objects], many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in objects],
+        })
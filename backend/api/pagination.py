@@ -1,6 +1,81 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class FeedCursorPagination(BasePagination):
+    """Курсорная пагинация ленты по (pub_date, id).
+
+    Курсор — base64 от даты публикации и id последнего рецепта страницы,
+    поэтому страницы не сдвигаются при появлении новых рецептов.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, recipe_id = base64.urlsafe_b64decode(
+                encoded.encode()
+            ).decode().split('|')
+            cursor = parse_datetime(pub_date), int(recipe_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    @staticmethod
+    def encode_cursor(pub_date, recipe_id):
+        return base64.urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode()
+        ).decode()
+
+    def paginate(self, request, fetch):
+        """Вызывает fetch(cursor, limit) и возвращает id рецептов страницы.
+
+        fetch должен вернуть до limit + 1 пар (pub_date, recipe_id)
+        в порядке убывания.
+        """
+        self.request = request
+        limit = self.get_page_size(request)
+        rows = fetch(self.decode_cursor(request), limit)
+        self.next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            self.next_cursor = self.encode_cursor(*rows[-1])
+        return [recipe_id for _, recipe_id in rows]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from recipes.models import Ingredient, Tag
+
+from .compression import available_encodings, choose_encoding, compress
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class ReferenceData:
+    """Готовый ответ со всем справочником: JSON и его сжатые варианты.
+
+    Тело строится один раз и отдаётся без обращения к ORM. Версия — хэш
+    содержимого, поэтому у всех процессов одинаковые ETag. Изменение
+    справочника меняет ключ в кэше Django, и процессы со старой
+    версией пересобирают ответ; без общего кэша это происходит не
+    позже чем через ``REFERENCE_DATA_REBUILD_INTERVAL`` секунд.
+    """
+
+    instances = {}
+
+    def __init__(self, model, serializer_class):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.instances[model] = self
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.built_at = None
+
+    @property
+    def cache_key(self):
+        return f'reference-data:{self.model._meta.label_lower}'
+
+    def invalidate(self):
+        cache.set(self.cache_key, time.time(), None)
+        self.built_at = None
+
+    def ensure(self):
+        stamp = cache.get(self.cache_key)
+        with self.lock:
+            expired = (
+                self.built_at is None
+                or stamp != self.stamp
+                or time.monotonic() - self.built_at
+                > settings.REFERENCE_DATA_REBUILD_INTERVAL
+            )
+            if expired:
+                self.build()
+                self.stamp = stamp
+                self.built_at = time.monotonic()
+
+    def build(self):
+        body = json.dumps(
+            self.serializer_class(self.model.objects.all(), many=True).data,
+            ensure_ascii=False, separators=(',', ':')
+        ).encode()
+        self.version = hashlib.sha1(body).hexdigest()[:16]
+        self.variants = {'identity': body}
+        for encoding in available_encodings():
+            self.variants[encoding] = compress(
+                body, encoding, settings.REFERENCE_DATA_COMPRESSION_LEVEL[
+                    encoding
+                ]
+            )
+
+    def response(self, request):
+        self.ensure()
+        encoding = choose_encoding(request) or 'identity'
+        etag = f'"{self.version}"'
+        if encoding != 'identity':
+            etag = f'"{self.version}-{encoding}"'
+        matches = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in matches or '*' in matches:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                self.variants[encoding], content_type='application/json'
+            )
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['X-Data-Version'] = self.version
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = (
+            f'public, max-age={settings.REFERENCE_DATA_MAX_AGE}'
+        )
+        return response
+
+
+tags_data = ReferenceData(Tag, TagSerializer)
+ingredients_data = ReferenceData(Ingredient, IngredientSerializer)
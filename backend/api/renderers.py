@@ -0,0 +1,57 @@
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson с тем же выводом, что и стандартный.
+
+    Даты и всё, что orjson не знает сам (ленивые строки, Decimal,
+    QuerySet), передаются в ``JSONEncoder.default`` DRF. С отступами
+    (браузерный API, ``; indent=``) и без установленного orjson работает
+    стандартный рендерер. Отличия от json: числа с плавающей точкой в
+    экспоненциальной записи пишутся без ``+`` и ведущего нуля порядка
+    (``1e16``), а NaN — как ``null``; сейчас API таких чисел не отдаёт.
+    """
+
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact \
+                or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит: json с ними справляется.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
+
+
+class NDJSONRenderer(ORJSONRenderer):
+    """Объект JSON одной строкой с переводом строки: строка потока
+    NDJSON или ошибка, отданная вместо потока."""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(
+            data, accepted_media_type, renderer_context
+        ) + b'\n'
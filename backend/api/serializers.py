@@ -1,13 +1,107 @@
-from django.db import transaction
+from django.conf import settings
+from django.db import models
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from jobs.models import Job
+from recipes.cards import deferred, ordered, payloads
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeCard,
+                            RecipeIngredient, ShoppingCart, Tag)
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import Subscription, User
 
+from .fragments import recipe_fragments
+
+
+def requested_fields(request, serializer_class):
+    """Поля ответа из параметров запроса ``fields`` и ``omit``.
+
+    ``fields`` оставляет только перечисленные поля, ``omit`` убирает
+    перечисленные. Возвращает None, если ни один параметр не передан.
+    """
+    available = serializer_class.Meta.fields
+    requested = {}
+    for param in ('fields', 'omit'):
+        value = request.query_params.get(param)
+        if value is None:
+            continue
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise serializers.ValidationError({
+                param: f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+            })
+        requested[param] = names
+    if not requested:
+        return None
+    fields = requested.get('fields', set(available))
+    return fields - requested.get('omit', set())
+
+
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля из контекста ``fields``.
+
+    Контекст заполняет представление через ``requested_fields``; во
+    вложенные сериализаторы он не передаётся при создании, поэтому
+    отбор касается только полей верхнего уровня.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+def followed_authors(request):
+    """Кэш подписок зрителя на время запроса: {id автора: подписан ли}."""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'followed_authors'):
+        request.followed_authors = {}
+    return request.followed_authors
+
+
+def load_followed_authors(request, author_ids):
+    """Одним запросом узнаёт подписки зрителя на ещё не известных авторов."""
+    if request is None or request.user.is_anonymous:
+        return
+    cache = followed_authors(request)
+    missing = {pk for pk in author_ids if pk not in cache}
+    if not missing:
+        return
+    followed = set(Subscription.objects.filter(
+        user=request.user, author_id__in=missing
+    ).values_list('author_id', flat=True))
+    for pk in missing:
+        cache[pk] = pk in followed
+
+
+def is_subscribed(request, author_id):
+    if request is None or request.user.is_anonymous:
+        return False
+    load_followed_authors(request, [author_id])
+    return followed_authors(request)[author_id]
+
+
+class ViewerStateListSerializer(serializers.ListSerializer):
+    """Перед выводом списка загружает подписки зрителя на его авторов.
+
+    Дочерний сериализатор сообщает id авторов через ``author_ids``, и
+    ``is_subscribed`` у всех пользователей страницы, включая вложенных
+    авторов рецептов, отвечается из кэша запроса.
+    """
+
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.Manager) else data
+        items = list(items)
+        load_followed_authors(
+            self.context.get('request'), self.child.author_ids(items)
+        )
+        return super().to_representation(items)
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Сериализатор создания пользователя."""
@@ -23,7 +117,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         ]
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     """Сериализатор модели пользователя."""
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -38,14 +132,15 @@ class CustomUserSerializer(UserSerializer):
             'last_name',
             'is_subscribed'
         ]
+        list_serializer_class = ViewerStateListSerializer
+
+    def author_ids(self, users):
+        if 'is_subscribed' not in self.fields:
+            return set()
+        return {user.pk for user in users}
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return is_subscribed(self.context.get('request'), obj.pk)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -78,13 +173,77 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор просмотра модели Рецепт."""
+# Поля ответа о рецепте из карточки; связанные требуют запросов к тегам,
+# автору и ингредиентам.
+FRAGMENT_FIELDS = {
+    'tags', 'author', 'ingredients', 'name', 'image', 'text', 'cooking_time'
+}
+RELATED_FRAGMENT_FIELDS = {'tags', 'author', 'ingredients'}
+
+
+def build_recipe_fragments(recipe_ids):
+    """Фрагменты рецептов, которых нет в кэше: {id: карточка}.
+
+    С RECIPE_CARDS читаются из таблицы карточек одним запросом, иначе
+    собираются одной пачкой запросов к рецептам и связанным таблицам.
+    """
+    if settings.RECIPE_CARDS:
+        return {
+            pk: ordered(card_payload)
+            for pk, card_payload in RecipeCard.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', 'payload')
+        }
+    return payloads(recipe_ids)
+
+
+def build_column_fragments(recipe_ids):
+    """Фрагменты рецептов без тегов, автора и ингредиентов: {id: поля}.
+
+    Хватает для ответа, в котором связанных полей не запросили, и
+    обходится одним запросом к таблице рецептов. В кэш не кладутся.
+    """
+    return {
+        recipe.pk: {
+            'id': recipe.pk,
+            'name': recipe.name,
+            'image': recipe.image.url if recipe.image else None,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).only(
+            'name', 'image', 'text', 'cooking_time'
+        )
+    }
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Собирает страницу рецептов из кэша фрагментов за одно обращение."""
+
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.Manager) else data
+        return self.child.represent(list(items))
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Сериализатор просмотра модели Рецепт.
+
+    Общая для всех часть — карточка рецепта (recipes.cards.payload) из
+    ``recipe_fragments`` или из загруженной RecipeCard; поверх неё
+    проставляются ``is_favorited``, ``is_in_shopping_cart`` и
+    ``author.is_subscribed``. От рецептов нужны только id и аннотации
+    ``is_favorited`` и ``is_in_shopping_cart``.
+
+    Отбор полей (``fields``/``omit``) сокращает и запросы: без полей
+    карточки фрагменты не читаются, а без тегов, автора и ингредиентов
+    промахи кэша добираются одним запросом к рецептам.
+    """
 
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
-
-    ingredients = serializers.SerializerMethodField()
+    ingredients = RecipeIngredientSerializer(
+        source='recipeingredient_set', many=True, read_only=True
+    )
     is_favorited = serializers.SerializerMethodField(
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -104,15 +263,63 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time'
         ]
+        list_serializer_class = RecipeListSerializer
 
-    def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(ingredients, many=True).data
+    def to_representation(self, instance):
+        data = self.represent([instance])
+        if not data:
+            raise NotFound
+        return data[0]
+
+    def fragments(self, recipes):
+        fields = set(self.fields)
+        if not fields & FRAGMENT_FIELDS:
+            return {recipe.pk: {'id': recipe.pk} for recipe in recipes}
+        if all(isinstance(recipe, RecipeCard) for recipe in recipes):
+            return {recipe.pk: ordered(recipe.payload) for recipe in recipes}
+        ids = [recipe.pk for recipe in recipes]
+        if fields & RELATED_FRAGMENT_FIELDS:
+            return recipe_fragments.get_many(ids, build_recipe_fragments)
+        return recipe_fragments.get_many(
+            ids, build_column_fragments, store=False
+        )
+
+    def represent(self, recipes):
+        fragments = self.fragments(recipes)
+        request = self.context.get('request')
+        if 'author' in self.fields:
+            load_followed_authors(request, {
+                fragment['author']['id'] for fragment in fragments.values()
+            })
+        return [
+            self.overlay(recipe, fragments[recipe.pk], request)
+            for recipe in recipes if recipe.pk in fragments
+        ]
+
+    def overlay(self, recipe, fragment, request):
+        data = {}
+        for name in self.fields:
+            if name in ('is_favorited', 'is_in_shopping_cart'):
+                data[name] = getattr(self, f'get_{name}')(recipe)
+            elif name == 'author':
+                data[name] = {
+                    **fragment[name],
+                    'is_subscribed': is_subscribed(
+                        request, fragment[name]['id']
+                    ),
+                }
+            elif name == 'image' and request is not None and fragment[name]:
+                data[name] = request.build_absolute_uri(fragment[name])
+            else:
+                data[name] = fragment[name]
+        return data
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return Favorite.objects.filter(
             user=request.user, recipe_id=obj
         ).exists()
@@ -121,6 +328,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return ShoppingCart.objects.filter(
             user=request.user, recipe_id=obj
         ).exists()
@@ -221,23 +430,23 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe.recipe_ingredients.bulk_create(ingredients_in_recipe)
         return recipe
 
-    @transaction.atomic
     def create(self, validated_data):
 
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = super().create(validated_data)
-        return self.create_or_update_obj(recipe, tags, ingredients)
+        with deferred():
+            recipe = super().create(validated_data)
+            return self.create_or_update_obj(recipe, tags, ingredients)
 
-    @transaction.atomic
     def update(self, instance, validated_data):
 
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.ingredients.clear()
-        recipe = super().update(instance, validated_data)
-        return self.create_or_update_obj(recipe, tags, ingredients)
+        with deferred():
+            instance.tags.clear()
+            instance.ingredients.clear()
+            recipe = super().update(instance, validated_data)
+            return self.create_or_update_obj(recipe, tags, ingredients)
 
 
 class ShowFavoriteSerializer(serializers.ModelSerializer):
@@ -274,7 +483,8 @@ class FavoriteSerializer(serializers.ModelSerializer):
         }).data
 
 
-class ShowSubscriptionsSerializer(serializers.ModelSerializer):
+class ShowSubscriptionsSerializer(SparseFieldsMixin,
+                                  serializers.ModelSerializer):
     """Сериализатор для отображения подписок пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -293,13 +503,15 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count'
         ]
+        list_serializer_class = ViewerStateListSerializer
+
+    def author_ids(self, users):
+        if 'is_subscribed' not in self.fields:
+            return set()
+        return {user.pk for user in users}
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj).exists()
+        return is_subscribed(self.context.get('request'), obj.pk)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
@@ -315,6 +527,8 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
             recipes, many=True, context={'request': request}).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
 
@@ -335,3 +549,50 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return ShowSubscriptionsSerializer(instance.author, context={
             'request': self.context.get('request')
         }).data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор статуса фоновой задачи."""
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'max_attempts',
+            'run_at',
+            'result',
+            'created',
+            'finished'
+        ]
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Один запрос пакета."""
+
+    method = serializers.ChoiceField(
+        choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+    )
+    path = serializers.RegexField(r'^/api/')
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет запросов: список или объект с ``requests`` и ``atomic``."""
+
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            data = {'requests': data}
+        return super().to_internal_value(data)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_REQUESTS} запросов в пакете.'
+            )
+        return value
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Ingredient, Tag
+from recipes.signals import recipes_updated
+
+from .fragments import recipe_fragments
+from .reference import ReferenceData
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reference_changed(sender, **kwargs):
+    transaction.on_commit(ReferenceData.instances[sender].invalidate)
+    transaction.on_commit(recipe_fragments.invalidate_all)
+
+
+@receiver(recipes_updated)
+def recipe_fragments_changed(sender, recipe_ids, **kwargs):
+    recipe_fragments.invalidate(recipe_ids)
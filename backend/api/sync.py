@@ -0,0 +1,79 @@
+from recipes import sync
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .renderers import NDJSONRenderer
+from .serializers import build_recipe_fragments
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        'Курсор устарел: удаления за этот срок уже не хранятся. '
+        'Синхронизируйте каталог заново, без курсора.'
+    )
+    default_code = 'cursor_expired'
+
+
+def cursor_from(request):
+    encoded = request.query_params.get('cursor')
+    if encoded is None:
+        return sync.Cursor()
+    try:
+        cursor = sync.Cursor.decode(encoded)
+    except ValueError:
+        raise ValidationError({'cursor': 'Неверный курсор.'})
+    if sync.expired(cursor):
+        raise CursorExpired()
+    return cursor
+
+
+def change_stream(request, cursor):
+    """Строки NDJSON с изменениями каталога после курсора.
+
+    Сначала удаления (``deleted``), затем изменённые и новые рецепты
+    (``recipe``) в порядке изменения. После каждой пачки рецептов идёт
+    строка ``cursor``, с которой можно продолжить оборванную загрузку;
+    последняя строка — ``cursor`` с ``"done": true``. Пачка отдаётся в
+    сокет одной записью.
+    """
+    render = NDJSONRenderer().render
+    until = sync.horizon()
+    for chunk in sync.deleted(cursor, until):
+        yield b''.join(
+            render({'type': 'deleted', 'id': recipe_id, 'deleted_at': when})
+            for recipe_id, when in chunk
+        )
+    for chunk in sync.updated(cursor, until):
+        recipes = build_recipe_fragments([recipe_id for recipe_id, _ in chunk])
+        lines = []
+        for recipe_id, updated_at in chunk:
+            # Рецепт удалён после выборки: удаление придёт в следующий раз.
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            if recipe['image']:
+                recipe = {
+                    **recipe,
+                    'image': request.build_absolute_uri(recipe['image']),
+                }
+            lines.append(render({
+                'type': 'recipe',
+                'id': recipe_id,
+                'updated_at': updated_at,
+                'recipe': recipe,
+            }))
+        last_id, last_updated_at = chunk[-1]
+        lines.append(render({
+            'type': 'cursor',
+            'cursor': sync.Cursor(
+                until, (last_updated_at, last_id)
+            ).encode(),
+            'done': False,
+        }))
+        yield b''.join(lines)
+    yield render({
+        'type': 'cursor',
+        'cursor': sync.Cursor(until, (until, None)).encode(),
+        'done': True,
+    })
@@ -0,0 +1,85 @@
+import threading
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+TOGGLES = (
+    ('favorite', Favorite),
+    ('shopping_cart', ShoppingCart),
+)
+
+
+def concurrently(count, request):
+    """Выполняет request в count потоках одновременно; коды ответов."""
+    barrier = threading.Barrier(count)
+    statuses = []
+
+    def run():
+        try:
+            barrier.wait()
+            statuses.append(request().status_code)
+        finally:
+            # У каждого потока своё соединение с базой.
+            connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(statuses)
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'Переключатели одним запросом с CTE есть только в PostgreSQL.'
+)
+class ConcurrentToggleTests(TransactionTestCase):
+    """Одновременные одинаковые запросы: ровно один меняет данные."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='x',
+            first_name='Зритель', last_name='Зрителев'
+        )
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='x',
+            first_name='Автор', last_name='Авторов'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+
+    def request(self, method, kind):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/recipes/{self.recipe.pk}/{kind}/'
+        return lambda: getattr(client, method)(url)
+
+    def test_concurrent_add(self):
+        for kind, model in TOGGLES:
+            with self.subTest(kind):
+                statuses = concurrently(2, self.request('post', kind))
+                self.assertEqual(statuses, [201, 400])
+                self.assertEqual(
+                    model.objects.filter(
+                        user=self.user, recipe=self.recipe
+                    ).count(),
+                    1
+                )
+
+    def test_concurrent_remove(self):
+        for kind, model in TOGGLES:
+            with self.subTest(kind):
+                model.objects.create(user=self.user, recipe=self.recipe)
+                statuses = concurrently(2, self.request('delete', kind))
+                self.assertEqual(statuses, [204, 400])
+                self.assertFalse(model.objects.filter(
+                    user=self.user, recipe=self.recipe
+                ).exists())
@@ -0,0 +1,88 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Ограничение частоты запросов скользящим окном в общем кэше Django.
+
+    Бюджет берётся из ``throttle_scope`` представления или действия, а
+    без него — по методу: ``read`` для чтения, ``write`` для записи.
+    Считается отдельно для каждого пользователя, анонимов — по IP.
+
+    Число запросов за последний период оценивается как счётчик текущего
+    окна плюс доля счётчика прошлого окна, ещё попадающая в период. В
+    отличие от списка отметок времени ``SimpleRateThrottle`` это три
+    обращения к кэшу, а ``incr`` атомарен, так что параллельные запросы
+    одного клиента не превышают лимит. Отклонённые запросы бюджет не
+    расходуют.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # Область известна только вместе с представлением.
+        pass
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_rate(self):
+        # Настройки читаются при каждом запросе, чтобы их можно было
+        # переопределить через override_settings.
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        current_key = f'{key}:{window}'
+        self.cache.add(current_key, 0, 2 * self.duration)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Ключ истёк между add и incr.
+            self.cache.set(current_key, 1, 2 * self.duration)
+            self.current = 1
+        self.previous = self.cache.get(f'{key}:{window - 1}', 0)
+        if self.estimate() <= self.num_requests:
+            return True
+        self.cache.decr(current_key)
+        self.current -= 1
+        return False
+
+    def estimate(self):
+        return self.current + self.previous * (
+            1 - self.elapsed / self.duration
+        )
+
+    def wait(self):
+        """Через сколько секунд пройдёт следующий запрос."""
+        # В следующем окне текущий счётчик станет прошлым и начнёт
+        # затухать.
+        wait = self.duration - self.elapsed
+        if self.current:
+            wait += max(self.duration * (
+                1 - (self.num_requests - 1) / self.current
+            ), 0)
+        if self.current < self.num_requests and self.previous:
+            wait = min(wait, max(self.duration * (
+                1 - (self.num_requests - self.current - 1) / self.previous
+            ) - self.elapsed, 0))
+        return wait
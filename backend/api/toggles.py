@@ -0,0 +1,165 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_delete, post_save
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+RECIPE_COLUMNS = ('id', 'name', 'image', 'cooking_time')
+AUTHOR_COLUMNS = ('id', 'email', 'username', 'first_name', 'last_name')
+
+
+def add(model, field, user_id, target_id, columns, extra=''):
+    """Создаёт связь пользователя с объектом одним INSERT ... ON CONFLICT.
+
+    Исход определяет уникальное ограничение, а не предварительные
+    проверки, поэтому два одновременных запроса не создадут дубль.
+    Возвращает (строку объекта или None, если его нет; создана ли связь).
+    """
+    if connection.vendor != 'postgresql':
+        return add_separately(model, field, user_id, target_id, columns, extra)
+    target = model._meta.get_field(field)
+    select = ', '.join(columns)
+    with connection.cursor() as cursor:
+        try:
+            # Точка сохранения: после ошибки внешняя транзакция (например,
+            # атомарный /api/batch/) остаётся рабочей.
+            with transaction.atomic():
+                cursor.execute(
+                    f'''
+                    WITH target AS (
+                        SELECT {select}{extra}
+                        FROM {target.related_model._meta.db_table} t
+                        WHERE id = %s
+                    ), added AS (
+                        INSERT INTO {model._meta.db_table}
+                            (user_id, {target.column})
+                        SELECT %s, id FROM target
+                        ON CONFLICT DO NOTHING
+                        RETURNING id
+                    )
+                    SELECT target.*, (SELECT id FROM added) FROM target
+                    ''',
+                    [target_id, user_id]
+                )
+                row = cursor.fetchone()
+        except IntegrityError:
+            # Объект удалили между чтением и вставкой.
+            return None, False
+    if row is None:
+        return None, False
+    *row, link_id = row
+    if link_id is not None:
+        post_save.send(
+            sender=model, instance=model(
+                id=link_id, user_id=user_id, **{target.attname: target_id}
+            ),
+            created=True, update_fields=None, raw=False,
+            using=connection.alias
+        )
+    return row, link_id is not None
+
+
+def remove(model, field, user_id, target_id):
+    """Удаляет связь пользователя с объектом одним DELETE.
+
+    Возвращает (существует ли объект, удалена ли связь).
+    """
+    if connection.vendor != 'postgresql':
+        return remove_separately(model, field, user_id, target_id)
+    target = model._meta.get_field(field)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH target AS (
+                SELECT id FROM {target.related_model._meta.db_table}
+                WHERE id = %s
+            ), removed AS (
+                DELETE FROM {model._meta.db_table}
+                WHERE user_id = %s
+                    AND {target.column} IN (SELECT id FROM target)
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM target), (SELECT id FROM removed)
+            ''',
+            [target_id, user_id]
+        )
+        exists, link_id = cursor.fetchone()
+    if link_id is not None:
+        post_delete.send(
+            sender=model, instance=model(
+                id=link_id, user_id=user_id, **{target.attname: target_id}
+            ),
+            using=connection.alias
+        )
+    return exists, link_id is not None
+
+
+def add_separately(model, field, user_id, target_id, columns, extra=''):
+    """``add`` для баз без изменяющих CTE (SQLite): отдельные запросы.
+
+    Дубль по-прежнему не даёт создать уникальное ограничение.
+    """
+    target = model._meta.get_field(field)
+    select = ', '.join(columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {select}{extra} '
+            f'FROM {target.related_model._meta.db_table} t WHERE id = %s',
+            [target_id]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None, False
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                user_id=user_id, **{target.attname: target_id}
+            )
+    except IntegrityError:
+        return list(row), False
+    return list(row), True
+
+
+def remove_separately(model, field, user_id, target_id):
+    """``remove`` для баз без изменяющих CTE (SQLite): отдельные запросы."""
+    target = model._meta.get_field(field)
+    exists = target.related_model.objects.filter(pk=target_id).exists()
+    deleted, _ = model.objects.filter(
+        user_id=user_id, **{target.attname: target_id}
+    ).delete()
+    return exists, deleted > 0
+
+
+def add_recipe(model, user_id, recipe_id):
+    """Добавляет рецепт в избранное или корзину.
+
+    Возвращает (рецепт с полями краткой карточки или None, создано ли).
+    """
+    row, created = add(model, 'recipe', user_id, recipe_id, RECIPE_COLUMNS)
+    if row is None:
+        return None, False
+    return Recipe(**dict(zip(RECIPE_COLUMNS, row))), created
+
+
+def remove_recipe(model, user_id, recipe_id):
+    return remove(model, 'recipe', user_id, recipe_id)
+
+
+def subscribe(user_id, author_id):
+    """Подписывает на автора; у автора заполнен ``recipes_count``."""
+    row, created = add(
+        Subscription, 'author', user_id, author_id, AUTHOR_COLUMNS,
+        extra=(
+            f', (SELECT count(*) FROM {Recipe._meta.db_table} r '
+            f'WHERE r.author_id = t.id) AS recipes_count'
+        )
+    )
+    if row is None:
+        return None, False
+    *row, recipes_count = row
+    author = User(**dict(zip(AUTHOR_COLUMNS, row)))
+    author.recipes_count = recipes_count
+    return author, created
+
+
+def unsubscribe(user_id, author_id):
+    return remove(Subscription, 'author', user_id, author_id)
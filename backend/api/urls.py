@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, ShowSubscriptionsView,
-                    SubscribeView, TagViewSet)
+from .views import (BatchView, IngredientViewSet, JobViewSet, RecipeViewSet,
+                    ShowSubscriptionsView, SubscribeView, TagViewSet)
 
 from users.views import CustomUserViewSet
 
@@ -11,11 +11,14 @@ app_name = 'api'
 router = DefaultRouter()
 
 router.register('ingredients', IngredientViewSet, basename='ingredients')
+router.register('jobs', JobViewSet, basename='jobs')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
+router.register('users', CustomUserViewSet, basename='users')
 router.register('user', CustomUserViewSet, basename='user')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
     path(
         'users/<int:id>/subscribe/',
         SubscribeView.as_view(),
@@ -27,6 +30,6 @@ urlpatterns = [
         name='subscriptions'
     ),
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include('djoser.urls')),
     path('', include(router.urls)),
+    path('', include('djoser.urls')),
 ]
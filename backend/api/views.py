@@ -1,6 +1,6 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
@@ -9,17 +9,99 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
-                            Tag)
-from users.models import Subscription, User
-
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.cards import deferred
+from recipes.feed import timeline
+from recipes.indexes import similarity_index
+from recipes.jobs import shopping_list_text
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeCard,
+                            ShoppingCart, Tag)
+from users.models import User
+
+from .batch import Batch
+from .filters import IngredientFilter, RecipeCardFilter, RecipeFilter
+from .mixins import MultiGetMixin
+from .pagination import CustomPagination, FeedCursorPagination
 from .permissions import IsAuthorOrAdminOrReadOnly
-from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, ShowSubscriptionsSerializer,
-                          SubscriptionSerializer, TagSerializer)
+from .reference import ingredients_data, tags_data
+from .renderers import NDJSONRenderer, ORJSONRenderer
+from .serializers import (FRAGMENT_FIELDS, BatchSerializer,
+                          CreateRecipeSerializer, IngredientSerializer,
+                          JobSerializer, RecipeSerializer,
+                          ShowFavoriteSerializer, ShowSubscriptionsSerializer,
+                          TagSerializer, followed_authors, requested_fields)
+from .sync import change_stream, cursor_from
+from .toggles import add_recipe, remove_recipe, subscribe, unsubscribe
+
+
+def recipes_for_fields(queryset, fields, user):
+    """Загружает для RecipeSerializer только id и признаки зрителя.
+
+    Остальное сериализатор берёт из кэша фрагментов, а промахи
+    подгружает сам одной пачкой. Признаки избранного и корзины
+    запрашиваются на всю страницу в том же запросе. Карточки читаются,
+    только если запрошено хоть одно их поле.
+    """
+    if fields is None:
+        fields = set(RecipeSerializer.Meta.fields)
+    if queryset.model is RecipeCard and fields & FRAGMENT_FIELDS:
+        queryset = queryset.only('payload')
+    else:
+        queryset = queryset.only('pk')
+    if user.is_authenticated:
+        for name, model in (
+            ('is_favorited', Favorite),
+            ('is_in_shopping_cart', ShoppingCart),
+        ):
+            if name in fields:
+                queryset = queryset.annotate(**{name: Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )})
+    return queryset
+
+
+def object_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def subscribe_to(request, author_id):
+    """Подписка на автора: 201, 400 при повторе, 404 без автора."""
+    author_id = object_id(author_id)
+    if author_id == request.user.id:
+        return Response(
+            {'errors': 'Нельзя подписаться на самого себя.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    author, created = subscribe(request.user.id, author_id)
+    if author is None:
+        raise Http404
+    if not created:
+        return Response(
+            {'errors': 'Подписка уже существует.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    followed_authors(request)[author.pk] = True
+    serializer = ShowSubscriptionsSerializer(
+        author, context={'request': request}
+    )
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def unsubscribe_from(request, author_id):
+    """Отписка от автора: 204, 400 без подписки, 404 без автора."""
+    exists, removed = unsubscribe(request.user.id, object_id(author_id))
+    if not exists:
+        raise Http404
+    if not removed:
+        return Response(
+            {'errors': 'Подписки не было.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class SubscribeView(APIView):
@@ -28,29 +110,10 @@ class SubscribeView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, id):
-        data = {
-            'user': request.user.id,
-            'author': id
-        }
-        serializer = SubscriptionSerializer(
-            data=data,
-            context={'request': request}
-        )
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return subscribe_to(request, id)
 
     def delete(self, request, id):
-        author = get_object_or_404(User, id=id)
-        if Subscription.objects.filter(
-           user=request.user, author=author).exists():
-            subscription = get_object_or_404(
-                Subscription, user=request.user, author=author
-            )
-            subscription.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return unsubscribe_from(request, id)
 
 
 class ShowSubscriptionsView(ListAPIView):
@@ -62,7 +125,22 @@ class ShowSubscriptionsView(ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(author__user=user)
+        queryset = User.objects.filter(author__user=user)
+        fields = self.requested_fields()
+        if fields is None or 'recipes_count' in fields:
+            # Meta.ordering не применяется к запросам с GROUP BY.
+            queryset = queryset.annotate(
+                recipes_count=Count('recipes')
+            ).order_by(*User._meta.ordering)
+        return queryset
+
+    def requested_fields(self):
+        return requested_fields(self.request, ShowSubscriptionsSerializer)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields()
+        return context
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -72,6 +150,11 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return tags_data.response(request)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Отображение ингредиентов."""
@@ -83,113 +166,227 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return ingredients_data.response(request)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(MultiGetMixin, viewsets.ModelViewSet):
     """Операции с рецептами: добавление/изменение/удаление/просмотр."""
 
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     pagination_class = CustomPagination
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
-    filterset_class = RecipeFilter
+    # Действия с отдельным бюджетом запросов задают его в @action.
+    throttle_scope = None
+
+    def reads_cards(self):
+        request = getattr(self, 'request', None)
+        return (
+            settings.RECIPE_CARDS
+            and request is not None and request.method == 'GET'
+        )
+
+    @property
+    def filterset_class(self):
+        if self.reads_cards():
+            return RecipeCardFilter
+        return RecipeFilter
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return CreateRecipeSerializer
 
+    def get_queryset(self):
+        if self.request.method != 'GET':
+            return super().get_queryset()
+        if self.reads_cards():
+            queryset = RecipeCard.objects.all()
+        else:
+            queryset = super().get_queryset()
+        return recipes_for_fields(
+            queryset, self.requested_fields(), self.request.user
+        )
+
+    def perform_destroy(self, instance):
+        # Каскадное удаление тегов и ингредиентов шлёт сигнал на каждую
+        # строку; карточка удаляется один раз.
+        with deferred():
+            instance.delete()
+
+    def requested_fields(self):
+        if self.request.method != 'GET':
+            return None
+        return requested_fields(self.request, RecipeSerializer)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context.update({'request': self.request})
+        context.update({
+            'request': self.request,
+            'fields': self.requested_fields(),
+        })
         return context
 
     @staticmethod
-    def process_favorite(request, pk, serializer_class):
-        data = {
-            'user': request.user.id,
-            'recipe': pk
-        }
-        serializer = serializer_class(data=data, context={'request': request})
-        if serializer.is_valid():
-            serializer.save()
+    def toggle_recipe(request, pk, model):
+        recipe_id = object_id(pk)
+        if request.method == 'POST':
+            recipe, created = add_recipe(model, request.user.id, recipe_id)
+            if recipe is None:
+                raise Http404
+            if not created:
+                return Response(
+                    {'errors': 'Рецепт уже добавлен.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            serializer = ShowFavoriteSerializer(
+                recipe, context={'request': request}
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        exists, removed = remove_recipe(model, request.user.id, recipe_id)
+        if not exists:
+            raise Http404
+        if not removed:
+            return Response(
+                {'errors': 'Рецепт не был добавлен.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(methods=['POST'], detail=True)
+    @action(
+        methods=['POST'], detail=True, url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
     def add_to_favorites(self, request, pk=None):
-        return self.process_favorite(
-            request=request, pk=pk,
-            serializer_class=FavoriteSerializer)
+        return self.toggle_recipe(request, pk, Favorite)
 
     @add_to_favorites.mapping.delete
     def remove_from_favorites(self, request, pk=None):
-        return self.process_favorite(
-            request=request, pk=pk,
-            serializer_class=FavoriteSerializer
-        )
+        return self.toggle_recipe(request, pk, Favorite)
 
-    @staticmethod
-    def process_shopping_cart(request, pk, serializer_class):
-        data = {'user': request.user.id, 'recipe': pk}
-        recipe = get_object_or_404(Recipe, id=pk)
-        if not ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
-            serializer = serializer_class(
-                data=data, context={'request': request}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-        return Response(status=status.HTTP_400_BAD_REQUEST)
-
-    @action(methods=['POST'], detail=True)
+    @action(
+        methods=['POST'], detail=True, url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
     def add_to_shopping_cart(self, request, pk=None):
-        return self.process_shopping_cart(
-            request=request, pk=pk, serializer_class=ShoppingCartSerializer
-        )
+        return self.toggle_recipe(request, pk, ShoppingCart)
 
     @add_to_shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
-        instance = ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).first()
-        if instance:
-            instance.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {'detail': 'Рецепт не найден в корзине.'},
-            status=status.HTTP_404_NOT_FOUND
+        return self.toggle_recipe(request, pk, ShoppingCart)
+
+    @action(
+        methods=['GET'], detail=False, permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedCursorPagination()
+        recipe_ids = paginator.paginate(
+            request,
+            lambda cursor, limit: timeline(request.user, cursor, limit)
+        )
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['GET'], detail=False,
+        renderer_classes=[NDJSONRenderer, ORJSONRenderer]
+    )
+    def changes(self, request):
+        """Изменения каталога после ``cursor`` потоком NDJSON.
+
+        Без курсора отдаёт весь каталог; курсор для следующего раза —
+        в последней строке.
+        """
+        return StreamingHttpResponse(
+            change_stream(request, cursor_from(request)),
+            content_type=NDJSONRenderer.media_type
         )
 
-    @action(methods=['GET'], detail=False)
-    def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        ingredient_lines = []
-        for ingredient_data in ingredients:
-            line = (
-                f'{ingredient_data["ingredient__name"]} - '
-                f'{ingredient_data["amount"]} '
-                f'{ingredient_data["ingredient__measurement_unit"]}'
-            )
-            ingredient_lines.append(line)
-
-        ingredient_list = ','.join(ingredient_lines)
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.SIMILAR_RECIPES_LIMIT
+            ))
+            similar = similarity_index.similar(int(pk), max(min(
+                limit, settings.SIMILAR_RECIPES_MAX_LIMIT
+            ), 1))
+        except ValueError:
+            raise Http404
+        if similar is None:
+            raise Http404
+        recipes = Recipe.objects.in_bulk([
+            recipe_id for recipe_id, _ in similar
+        ])
+        serializer = ShowFavoriteSerializer(
+            [recipes[recipe_id] for recipe_id, _ in similar
+             if recipe_id in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
 
+    @action(methods=['GET'], detail=False, throttle_scope='export')
+    def download_shopping_cart(self, request):
         file_name = 'shopping_list'
         response = HttpResponse(
-            ingredient_list, content_type='application/pdf'
+            shopping_list_text(request.user), content_type='application/pdf'
         )
         response['Content-Disposition'] = (
             f'attachment; filename="{file_name}.pdf"'
         )
         return response
+
+    @download_shopping_cart.mapping.post
+    def request_shopping_cart(self, request):
+        """Собирает список покупок в фоне; файл будет в результате задачи.
+
+        Повтор запроса с тем же заголовком Idempotency-Key возвращает уже
+        поставленную задачу.
+        """
+        if not request.user.is_authenticated:
+            self.permission_denied(request)
+        key = request.headers.get('Idempotency-Key')
+        job = enqueue(
+            'recipes.shopping_list', {'user_id': request.user.id},
+            key=key and f'shopping-list:{request.user.id}:{key}',
+            user=request.user
+        )
+        serializer = JobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Статус фоновых задач пользователя."""
+
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CustomPagination
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
+
+
+class BatchView(APIView):
+    """Несколько запросов к API за один HTTP-запрос."""
+
+    permission_classes = (AllowAny,)
+    # Каждый вложенный запрос расходует бюджет своего представления.
+    throttle_classes = ()
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        batch = Batch(request, serializer.validated_data['requests'])
+        return Response(batch.run(serializer.validated_data['atomic']))
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import URLResolver, get_resolver
+from recipes.indexes import pantry_index, similarity_index
+
+
+def compile_patterns(patterns):
+    """Компилирует регулярные выражения всех маршрутов."""
+    for pattern in patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            pattern.reverse_dict
+            compile_patterns(pattern.url_patterns)
+
+
+def request_paths(paths):
+    """Проводит GET-запросы через всё приложение, как запросы клиентов.
+
+    Первый запрос к эндпоинту загружает переводы, строит сериализаторы
+    и рендереры, а справочники собирают готовые ответы.
+    """
+    handler = WSGIHandler()
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+    factory = RequestFactory(
+        HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost'
+    )
+    statuses = {}
+    for path in paths:
+        response = handler(
+            factory.get(path).environ, lambda status, headers: None
+        )
+        statuses[path] = response.status_code
+        response.close()
+    return statuses
+
+
+def warm_up():
+    """Прогревает приложение и возвращает время шагов в секундах.
+
+    gunicorn вызывает это в мастер-процессе до запуска воркеров, и они
+    получают прогретую память при fork. Соединения с базой и кэшем в
+    конце закрываются, чтобы воркеры не делили их сокеты.
+    """
+    timings = {}
+    steps = [
+        ('urls', lambda: compile_patterns(get_resolver().url_patterns)),
+        ('requests', lambda: request_paths(settings.WARMUP_PATHS)),
+    ]
+    if settings.WARMUP_INDEXES:
+        steps += [
+            ('similarity_index', similarity_index.ensure),
+            ('pantry_index', pantry_index.ensure),
+        ]
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            step()
+            timings[name] = round(time.perf_counter() - started, 3)
+    finally:
+        connections.close_all()
+        for cache in caches.all():
+            cache.close()
+    return timings
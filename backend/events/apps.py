@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class EventsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'events'
+    verbose_name = 'События для клиентов'
+
+    def ready(self):
+        from . import signals  # noqa: F401
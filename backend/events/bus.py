@@ -0,0 +1,224 @@
+"""Шина событий для клиентов, подключённых по SSE.
+
+Процессы, которые пишут рецепты, публикуют события через NOTIFY
+PostgreSQL. Каждый ASGI-процесс держит одно соединение с LISTEN и
+раздаёт события своим подключениям из памяти, поэтому число
+подключений не влияет на нагрузку на базу.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Служебная отметка в очереди подключения: пора отправить комментарий,
+# чтобы прокси не закрыли молчащее соединение.
+PING = object()
+
+
+def publish(event):
+    """Отправляет событие всем ASGI-процессам.
+
+    Внутри транзакции событие доставляется после фиксации.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, %s)',
+            [settings.EVENTS_CHANNEL, json.dumps(event)]
+        )
+
+
+class Subscriber:
+    """Подключённый клиент: очередь событий и авторы, на которых он
+    подписан.
+
+    Клиент, который не успевает читать, отключается при переполнении
+    очереди, а не копит события в памяти; EventSource переподключится
+    сам.
+    """
+
+    def __init__(self, user_id=None, authors=()):
+        self.user_id = user_id
+        self.authors = set(authors)
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventBus:
+    """Раздача событий подключениям одного процесса."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.by_author = defaultdict(set)
+        self.by_user = defaultdict(set)
+        self.loop = None
+        self.listener = None
+        self.heartbeat = None
+
+    def start(self):
+        """Запускает LISTEN и комментарии-пинги в текущем цикле событий."""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.listener = Listener(self)
+        self.listener.connect()
+        self.heartbeat = self.loop.call_later(
+            settings.EVENTS_HEARTBEAT, self.ping
+        )
+
+    def stop(self):
+        """Отключает всех клиентов и закрывает LISTEN."""
+        for subscriber in self.subscribers:
+            subscriber.close()
+        if self.loop is None:
+            return
+        self.heartbeat.cancel()
+        self.listener.close()
+        self.loop = self.listener = self.heartbeat = None
+
+    def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+        if subscriber.user_id is not None:
+            self.by_user[subscriber.user_id].add(subscriber)
+        for author_id in subscriber.authors:
+            self.by_author[author_id].add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        self.discard(self.by_user, subscriber.user_id, subscriber)
+        for author_id in subscriber.authors:
+            self.discard(self.by_author, author_id, subscriber)
+
+    @staticmethod
+    def discard(index, key, subscriber):
+        subscribers = index.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del index[key]
+
+    def dispatch(self, event):
+        kind = event['type']
+        if kind == 'subscription':
+            self.follow(event)
+            return
+        if kind == 'recipe.created':
+            subscribers = self.by_author.get(event['author_id'], ())
+        else:
+            subscribers = self.subscribers
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def follow(self, event):
+        """Подписка или отписка меняет, чьи новые рецепты получит клиент."""
+        author_id = event['author_id']
+        for subscriber in self.by_user.get(event['user_id'], ()):
+            if event['active']:
+                subscriber.authors.add(author_id)
+                self.by_author[author_id].add(subscriber)
+            else:
+                subscriber.authors.discard(author_id)
+                self.discard(self.by_author, author_id, subscriber)
+
+    def ping(self):
+        for subscriber in self.subscribers:
+            subscriber.put(PING)
+        self.heartbeat = self.loop.call_later(
+            settings.EVENTS_HEARTBEAT, self.ping
+        )
+
+
+class Listener:
+    """LISTEN в отдельном соединении psycopg2.
+
+    Уведомления читаются из цикла событий по готовности сокета, без
+    потоков. После обрыва соединение восстанавливается, а клиенты
+    получают событие ``resync``: пропущенное нужно перечитать.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.connection = None
+        self.fd = None
+        self.reconnect = None
+        self.connected_before = False
+
+    def connect(self):
+        self.reconnect = None
+        try:
+            self.connection = psycopg2.connect(
+                **connections['default'].get_connection_params()
+            )
+            self.connection.autocommit = True
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{settings.EVENTS_CHANNEL}"')
+        except psycopg2.Error:
+            logger.warning('Не удалось подписаться на события', exc_info=True)
+            self.retry()
+            return
+        self.fd = self.connection.fileno()
+        self.bus.loop.add_reader(self.fd, self.read)
+        if self.connected_before:
+            self.bus.dispatch({'type': 'resync'})
+        self.connected_before = True
+
+    def read(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error:
+            logger.warning('Соединение LISTEN оборвалось', exc_info=True)
+            self.retry()
+            return
+        notifies = self.connection.notifies
+        while notifies:
+            notify = notifies.pop(0)
+            try:
+                event = json.loads(notify.payload)
+            except ValueError:
+                logger.warning('Неверное событие: %r', notify.payload)
+                continue
+            self.bus.dispatch(event)
+
+    def retry(self):
+        self.close()
+        self.reconnect = self.bus.loop.call_later(
+            settings.EVENTS_RECONNECT_DELAY, self.connect
+        )
+
+    def close(self):
+        if self.reconnect is not None:
+            self.reconnect.cancel()
+            self.reconnect = None
+        if self.fd is not None:
+            self.bus.loop.remove_reader(self.fd)
+            self.fd = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+bus = EventBus()
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Recipe
+from recipes.signals import recipes_updated
+from users.models import Subscription
+
+from .bus import publish
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: publish({
+            'type': 'recipe.created',
+            'id': instance.pk,
+            'author_id': instance.author_id,
+        }))
+
+
+@receiver(recipes_updated)
+def recipes_updated_published(sender, recipe_ids, **kwargs):
+    # NOTIFY ограничен 8000 байтами, большие изменения уходят частями.
+    size = settings.EVENTS_MAX_IDS
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), size):
+        publish({
+            'type': 'recipe.updated',
+            'ids': recipe_ids[start:start + size],
+        })
+
+
+def subscription_changed(subscription, active):
+    event = {
+        'type': 'subscription',
+        'user_id': subscription.user_id,
+        'author_id': subscription.author_id,
+        'active': active,
+    }
+    transaction.on_commit(lambda: publish(event))
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        subscription_changed(instance, True)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    subscription_changed(instance, False)
@@ -0,0 +1,166 @@
+"""Поток событий (Server-Sent Events) поверх ASGI.
+
+Обработчик написан прямо на ASGI, а не как представление Django:
+Django 3.2 отдаёт потоковый ответ синхронным итератором, и каждое
+подключение занимало бы поток. Здесь подключение — корутина и очередь
+в памяти, тысячи простаивающих клиентов обходятся дёшево.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+from users.models import Subscription
+
+from .bus import PING, Subscriber, bus
+
+HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    # Запрещает nginx буферизовать поток.
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def token_from(scope):
+    """Токен из заголовка Authorization или параметра ``token``.
+
+    Браузерный EventSource не умеет передавать заголовки, поэтому токен
+    можно передать в строке запроса.
+    """
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    return query.get('token', [None])[0]
+
+
+@sync_to_async
+def load_viewer(key):
+    """id пользователя и авторов, на которых он подписан.
+
+    Для неверного токена возвращает None, для анонима — (None, []).
+    """
+    close_old_connections()
+    try:
+        if key is None:
+            return None, []
+        user_id = Token.objects.filter(
+            key=key, user__is_active=True
+        ).values_list('user_id', flat=True).first()
+        if user_id is None:
+            return None
+        return user_id, list(Subscription.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+    finally:
+        close_old_connections()
+
+
+def encode(event):
+    if event is PING:
+        return b': ping\n\n'
+    data = {key: value for key, value in event.items() if key != 'type'}
+    return (
+        f'event: {event["type"]}\n'
+        f'data: {json.dumps(data, separators=(",", ":"))}\n\n'
+    ).encode()
+
+
+async def respond(send, status, message):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': message}).encode(),
+    })
+
+
+async def wait_disconnect(receive, subscriber):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscriber.close()
+
+
+async def stream(scope, receive, send):
+    """GET /api/events/: события ``recipe.created`` о новых рецептах
+    авторов из подписок и ``recipe.updated`` об изменённых рецептах.
+
+    ``resync`` означает, что события могли потеряться и списки нужно
+    перечитать.
+    """
+    if scope['method'] != 'GET':
+        await respond(send, 405, 'Метод не разрешён.')
+        return
+    if len(bus.subscribers) >= settings.EVENTS_MAX_CONNECTIONS:
+        await respond(send, 503, 'Слишком много подключений.')
+        return
+    viewer = await load_viewer(token_from(scope))
+    if viewer is None:
+        await respond(send, 401, 'Недопустимый токен.')
+        return
+    bus.start()
+    subscriber = Subscriber(*viewer)
+    bus.subscribe(subscriber)
+    watcher = asyncio.ensure_future(wait_disconnect(receive, subscriber))
+    try:
+        await send({
+            'type': 'http.response.start', 'status': 200, 'headers': HEADERS
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {settings.EVENTS_RETRY}\n\n'.encode(),
+            'more_body': True,
+        })
+        while True:
+            # Накопившиеся события уходят одной записью в сокет.
+            events = [await subscriber.queue.get()]
+            while not subscriber.queue.empty():
+                events.append(subscriber.queue.get_nowait())
+            if None in events:
+                break
+            await send({
+                'type': 'http.response.body',
+                'body': b''.join(encode(event) for event in events),
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body'})
+    finally:
+        bus.unsubscribe(subscriber)
+        watcher.cancel()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            bus.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            bus.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def router(django_application):
+    """ASGI-приложение: поток событий на EVENTS_PATH, остальное — Django."""
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == (
+            settings.EVENTS_PATH
+        ):
+            await stream(scope, receive, send)
+        else:
+            await django_application(scope, receive, send)
+
+    return application
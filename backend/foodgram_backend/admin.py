@@ -0,0 +1,107 @@
+import json
+
+from django import forms
+from django.conf import settings
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает большие таблицы целиком.
+
+    Число строк берётся из оценки планировщика (EXPLAIN). Точный COUNT
+    выполняется только если оценка меньше ADMIN_EXACT_COUNT_LIMIT, то
+    есть для небольших таблиц и узких фильтров. Оценку в таком виде даёт
+    только PostgreSQL, на других базах считается обычный COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+class InstanceAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, которое берёт выбранное значение из объекта формы.
+
+    Обычный виджет запрашивает подпись выбранного значения отдельным
+    запросом, то есть по запросу на каждую строку инлайна.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(item) for item in value] != [
+            str(selected.pk)
+        ]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        label = self.choices.field.label_from_instance(selected)
+        options.append(self.create_option(
+            name, selected.pk, label, True, len(options)
+        ))
+        return [(None, options, 0)]
+
+
+class InstanceAutocompleteForm(forms.ModelForm):
+    """Передаёт виджетам автодополнения уже загруженные связанные объекты."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, InstanceAutocompleteSelect) and getattr(
+                self.instance, f'{name}_id', None
+            ):
+                widget.selected = getattr(self.instance, name)
+
+
+class AutocompleteMixin:
+    """autocomplete_fields без запроса на каждое выбранное значение.
+
+    Связанные объекты подгружаются через select_related вместе с
+    объектом или строками инлайна.
+    """
+
+    form = InstanceAutocompleteForm
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.autocomplete_fields:
+            queryset = queryset.select_related(*self.autocomplete_fields)
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = InstanceAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ScalableAdmin(AutocompleteMixin):
+    """Настройки списка для больших таблиц.
+
+    Оценка числа строк вместо COUNT и без второго подсчёта всей
+    таблицы рядом с результатами поиска.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
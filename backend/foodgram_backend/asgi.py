@@ -4,4 +4,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Модули приложений импортируются после настройки Django.
+from events.sse import router  # noqa: E402
+
+application = router(django_application)
@@ -26,25 +26,33 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
-    'debug_toolbar',
     'djoser',
     'api',
     'recipes',
     'users',
+    'profiler',
+    'jobs',
+    'events',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'profiler.middleware.ProfilerMiddleware',
 ]
 
+if DEBUG:
+    # В продакшене панель не нужна, а её импорт удлиняет запуск воркеров.
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
@@ -83,6 +91,19 @@ DATABASES = {
     }
 }
 
+# Ограничение частоты запросов, версии справочников и фрагменты рецептов
+# должны быть общими для всех процессов (gunicorn, runworker, uvicorn),
+# поэтому docker-compose поднимает memcached, а кэш в памяти процесса
+# не проходит manage.py check --deploy (api.checks).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -109,7 +130,26 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.SlidingWindowThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.getenv('THROTTLE_READ_RATE', '600/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', '60/min'),
+        'export': os.getenv('THROTTLE_EXPORT_RATE', '20/hour'),
+    },
+    # Адрес клиента берётся из X-Forwarded-For, который добавляет nginx.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 DJOSER = {
@@ -144,3 +184,91 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+RECIPE_INDEX_REBUILD_INTERVAL = 3600
+SIMILAR_RECIPES_TAG_WEIGHT = 0.5
+SIMILAR_RECIPES_COMPACT_THRESHOLD = 1000
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 50
+PANTRY_MAX_MISSING = 5
+
+MULTI_GET_MAX_IDS = 100
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+FEED_FANOUT_LIMIT = 10000
+FEED_BATCH_SIZE = 5000
+
+REFERENCE_DATA_REBUILD_INTERVAL = 300
+REFERENCE_DATA_MAX_AGE = 60
+# Справочники сжимаются один раз, поэтому уровень максимальный.
+REFERENCE_DATA_COMPRESSION_LEVEL = {'br': 11, 'gzip': 9}
+
+COMPRESSION_PATH_PREFIX = '/api/'
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 5
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Список и просмотр рецептов читают таблицу карточек RecipeCard; перед
+# включением её нужно собрать: manage.py recipe_cards --rebuild.
+RECIPE_CARDS = os.getenv('RECIPE_CARDS', 'False').lower() == 'true'
+RECIPE_CARDS_BATCH_SIZE = 1000
+
+# Фрагменты рецептов сменяют версию при изменении, срок жизни только
+# освобождает место от неактуальных версий.
+FRAGMENT_CACHE_TIMEOUT = 24 * 3600
+
+# Синхронизация каталога (GET /api/recipes/changes/). Изменения новее
+# SYNC_LAG секунд ждут следующей синхронизации: их транзакции могут быть
+# ещё не зафиксированы. Записи об удалениях хранятся SYNC_RETENTION
+# секунд, курсоры старше получают 410 и синхронизируются заново.
+SYNC_LAG = 60
+SYNC_CHUNK_SIZE = 500
+SYNC_RETENTION = 90 * 24 * 3600
+
+TRENDING_HALF_LIFE = 3 * 24 * 3600
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
+TRENDING_MIN_SCORE = 1e-6
+
+RECIPE_IMAGE_MAX_SIZE = 1600
+RECIPE_IMAGE_QUALITY = 85
+# Исходное изображение удаляется не сразу после замены обработанным:
+# его адрес остаётся в уже отданных ответах.
+RECIPE_IMAGE_DELETE_DELAY = 24 * 3600
+
+JOBS_CONCURRENCY = 4
+JOBS_POLL_INTERVAL = 1.0
+JOBS_LEASE = 300
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_MAX_DELAY = 3600
+
+# Поток событий для клиентов (events.sse) обслуживает ASGI-приложение.
+EVENTS_PATH = '/api/events/'
+EVENTS_CHANNEL = 'foodgram_events'
+EVENTS_MAX_CONNECTIONS = int(os.getenv('EVENTS_MAX_CONNECTIONS', 10000))
+EVENTS_QUEUE_SIZE = 100
+EVENTS_MAX_IDS = 500
+EVENTS_HEARTBEAT = 20
+EVENTS_RECONNECT_DELAY = 1
+# Пауза перед переподключением EventSource, в миллисекундах.
+EVENTS_RETRY = 5000
+
+# Ниже этой оценки планировщика админка считает строки точным COUNT.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Запросы, которыми gunicorn прогревает приложение перед запуском воркеров.
+WARMUP_PATHS = [
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/recipes/?limit=6',
+    '/api/users/?limit=6',
+]
+WARMUP_INDEXES = os.getenv('WARMUP_INDEXES', 'False').lower() == 'true'
+
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILER_MAX_PROFILES = int(os.getenv('PROFILER_MAX_PROFILES', 100))
+PROFILER_HEADER = 'X-Profile'
+PROFILER_QUERY_PARAM = 'profile'
+PROFILER_TRACEMALLOC_FRAMES = 10
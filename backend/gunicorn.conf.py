@@ -0,0 +1,39 @@
+"""Настройки gunicorn для продакшена.
+
+Приложение загружается в мастер-процессе (preload) и прогревается до
+запуска воркеров, поэтому воркеры стартуют без повторного импорта
+Django, DRF и остальных модулей и делят их память с мастером.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:9000')
+
+# Потоки покрывают ожидание базы, процессы — CPU; gthread держит
+# медленных клиентов, не занимая весь воркер.
+worker_class = 'gthread'
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)
+))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+# Перезапуск воркеров ограничивает рост памяти; разброс не даёт им
+# перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    from api.warmup import warm_up
+
+    timings = warm_up()
+    server.log.info('Прогрев приложения: %s', timings)
@@ -0,0 +1,41 @@
+from django.contrib import admin
+from django.utils import timezone
+from foodgram_backend.admin import ScalableAdmin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(ScalableAdmin, admin.ModelAdmin):
+    list_display = [
+        'id', 'name', 'status', 'attempts', 'max_attempts', 'user',
+        'created', 'run_at', 'finished', 'worker'
+    ]
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'key', 'user__username']
+    list_select_related = ['user']
+    readonly_fields = [
+        'name', 'payload', 'key', 'status', 'attempts', 'max_attempts',
+        'run_at', 'locked_until', 'worker', 'result', 'error', 'user',
+        'created', 'started', 'finished'
+    ]
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_retry_permission(self, request):
+        return request.user.has_perm('jobs.change_job')
+
+    @admin.action(
+        description='Повторить выбранные задачи', permissions=['retry']
+    )
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(),
+            finished=None
+        )
+        self.message_user(request, f'Поставлено в очередь: {count}')
@@ -0,0 +1,48 @@
+import signal
+
+from django.core.management.base import BaseCommand
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Обработчик фоновых задач. Очередь хранится в базе, брокер не '
+        'нужен; обработчиков можно запустить несколько.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Выполнять задачи в процессах, а не в потоках.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Пауза между опросами пустой очереди, с.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда готовых задач не останется.'
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            poll_interval=options['poll_interval']
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(
+            f'Обработчик {worker.name}: {worker.concurrency} '
+            f'{"процессов" if worker.processes else "потоков"}'
+        )
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено: {processed["succeeded"]}, '
+            f'отложено для повтора: {processed["queued"]}, '
+            f'с ошибкой: {processed["failed"]}'
+        ))
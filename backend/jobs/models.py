@@ -0,0 +1,78 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from users.models import User
+
+
+class Job(models.Model):
+    """Задача фоновой очереди."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (SUCCEEDED, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField('Задача', max_length=200, db_index=True)
+    payload = models.JSONField('Аргументы', default=dict, blank=True)
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята обработчиком до',
+        null=True,
+        blank=True
+    )
+    worker = models.CharField('Обработчик', max_length=255, blank=True)
+    result = models.JSONField('Результат', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь'
+    )
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            # Выборка очередной задачи читает только ждущие.
+            models.Index(
+                fields=['run_at'],
+                name='job_queued_idx',
+                condition=Q(status='queued')
+            ),
+            models.Index(
+                fields=['locked_until'],
+                name='job_running_idx',
+                condition=Q(status='running')
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.get_status_display()})'
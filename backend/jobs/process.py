@@ -0,0 +1,20 @@
+"""Точки входа процессов пула обработчика.
+
+Процесс запускается через spawn и получает функции по имени модуля,
+поэтому здесь нельзя импортировать модели до ``django.setup()``.
+"""
+import signal
+
+import django
+
+
+def setup():
+    django.setup()
+    # Ctrl+C получает вся группа процессов; останавливает пул родитель.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def execute(job_id, worker):
+    from .queue import execute
+
+    return execute(job_id, worker)
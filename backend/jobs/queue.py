@@ -0,0 +1,145 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+registry = {}
+
+
+def job(name=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи передаются именованными и хранятся в JSON, поэтому
+    должны сериализоваться. Функция может выполниться повторно после
+    сбоя обработчика, поэтому её действия должны быть идемпотентными.
+    """
+    def decorator(func):
+        func.job_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, key=None, user=None, delay=0):
+    """Ставит задачу в очередь и возвращает её.
+
+    Задача с уже известным ключом идемпотентности не создаётся заново —
+    возвращается существующая. Внутри транзакции задача станет видна
+    обработчикам только после фиксации.
+    """
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'user': user,
+        'max_attempts': registry[name].max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    return Job.objects.get_or_create(key=key, defaults=fields)[0]
+
+
+def backoff(attempts):
+    """Задержка перед повтором: экспонента со случайным разбросом."""
+    delay = min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.5, 1)
+
+
+def lease():
+    return timezone.now() + timedelta(seconds=settings.JOBS_LEASE)
+
+
+@transaction.atomic
+def claim(limit, worker):
+    """Забирает до limit готовых задач и возвращает их id.
+
+    SKIP LOCKED позволяет нескольким обработчикам разбирать очередь, не
+    дожидаясь друг друга и не получая одну задачу дважды.
+    """
+    now = timezone.now()
+    job_ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('run_at').values_list('id', flat=True)[:limit])
+    Job.objects.filter(id__in=job_ids).update(
+        status=Job.RUNNING,
+        attempts=F('attempts') + 1,
+        started=now,
+        locked_until=lease(),
+        worker=worker
+    )
+    return job_ids
+
+
+def extend(job_ids, worker):
+    """Продлевает аренду задач, которые обработчик ещё выполняет."""
+    Job.objects.filter(
+        id__in=job_ids, status=Job.RUNNING, worker=worker
+    ).update(locked_until=lease())
+
+
+def requeue_expired():
+    """Возвращает в очередь задачи обработчиков, переставших отвечать."""
+    expired = Job.objects.filter(
+        status=Job.RUNNING, locked_until__lt=timezone.now()
+    )
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error='Обработчик не завершил задачу.',
+        finished=timezone.now()
+    )
+    return expired.update(status=Job.QUEUED, run_at=timezone.now())
+
+
+def execute(job_id, worker):
+    """Выполняет задачу, записывает результат и возвращает новый статус.
+
+    Вызывается в потоке или процессе пула обработчика. Запись идёт
+    только если задачу не забрал другой обработчик после истечения
+    аренды.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.filter(pk=job_id).first()
+        if job is None:
+            return Job.FAILED
+        current = Job.objects.filter(
+            pk=job.pk, attempts=job.attempts, worker=worker,
+            status=Job.RUNNING
+        )
+        try:
+            func = registry[job.name]
+            result = func(**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                current.update(
+                    status=Job.FAILED, error=error, finished=timezone.now()
+                )
+            else:
+                current.update(
+                    status=Job.QUEUED, error=error,
+                    run_at=timezone.now() + timedelta(
+                        seconds=backoff(job.attempts)
+                    )
+                )
+                return Job.QUEUED
+            return Job.FAILED
+        current.update(
+            status=Job.SUCCEEDED, result=result, error='',
+            finished=timezone.now()
+        )
+        return Job.SUCCEEDED
+    finally:
+        close_old_connections()
@@ -0,0 +1,94 @@
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from django.conf import settings
+
+from . import process, queue
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Обработчик очереди: забирает задачи и выполняет их в пуле.
+
+    Потоки подходят для задач, ждущих базу, диск или сеть; процессы — для
+    задач, упирающихся в CPU (например, обработка изображений). Пока
+    задача выполняется, её аренда продлевается; задачи упавшего
+    обработчика после истечения аренды забирают другие.
+    """
+
+    def __init__(self, concurrency=None, processes=False,
+                 poll_interval=None, name=None):
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.processes = processes
+        self.poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = {Job.SUCCEEDED: 0, Job.QUEUED: 0, Job.FAILED: 0}
+
+    def executor(self):
+        if self.processes:
+            # spawn: дочерние процессы не наследуют соединения с базой.
+            return ProcessPoolExecutor(
+                self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup
+            )
+        return ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix='job'
+        )
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """Разбирает очередь до stop(); с burst — пока в ней есть задачи.
+
+        Начатые задачи при остановке дорабатываются.
+        """
+        running = {}
+        last_check = 0
+        with self.executor() as executor:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_check >= self.poll_interval:
+                    queue.requeue_expired()
+                    queue.extend(list(running.values()), self.name)
+                    last_check = time.monotonic()
+                free = self.concurrency - len(running)
+                job_ids = queue.claim(free, self.name) if free else []
+                for job_id in job_ids:
+                    future = executor.submit(
+                        process.execute, job_id, self.name
+                    )
+                    running[future] = job_id
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                done, _ = wait(
+                    running, timeout=0 if job_ids else self.poll_interval,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    self.finished(future, running.pop(future))
+            for future, job_id in running.items():
+                self.finished(future, job_id)
+        return self.processed
+
+    def finished(self, future, job_id):
+        try:
+            status = future.result()
+        except Exception:
+            # Ошибка самой очереди, а не задачи: задача останется
+            # занятой и вернётся в очередь по истечении аренды.
+            logger.exception('Сбой при выполнении задачи %s', job_id)
+            status = Job.FAILED
+        self.processed[status] += 1
@@ -0,0 +1,108 @@
+from django.contrib import admin
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from foodgram_backend.admin import ScalableAdmin
+
+from .models import RequestProfile
+from .utils import SORT_KEYS, collapse_stacks, render_stats
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(ScalableAdmin, admin.ModelAdmin):
+    list_display = [
+        'created', 'method', 'path', 'status_code', 'duration',
+        'has_memory', 'user', 'links'
+    ]
+    list_filter = ['method', 'has_memory']
+    search_fields = ['path']
+    list_select_related = ['user']
+    readonly_fields = [
+        'created', 'user', 'method', 'path', 'status_code', 'duration',
+        'has_memory'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/stats/',
+                self.admin_site.admin_view(self.stats_view),
+                name='profiler_requestprofile_stats'
+            ),
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download_view),
+                name='profiler_requestprofile_download'
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description='Отчёты')
+    def links(self, obj):
+        return format_html(
+            '<a href="{}">статистика</a> | <a href="{}">.prof</a> | '
+            '<a href="{}">collapsed</a>',
+            reverse('admin:profiler_requestprofile_stats', args=[obj.pk]),
+            reverse(
+                'admin:profiler_requestprofile_download',
+                args=[obj.pk, 'prof']
+            ),
+            reverse(
+                'admin:profiler_requestprofile_download',
+                args=[obj.pk, 'collapsed']
+            ),
+        )
+
+    def get_profile(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, profile):
+            raise Http404
+        if not profile.stats_path.exists():
+            raise Http404('Файл профиля удалён.')
+        return profile
+
+    def stats_view(self, request, pk):
+        profile = self.get_profile(request, pk)
+        sort = request.GET.get('sort', SORT_KEYS[0])
+        memory = None
+        if profile.has_memory and profile.memory_path.exists():
+            memory = profile.memory_path.read_text(encoding='utf-8')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': str(profile),
+            'profile': profile,
+            'sort': sort,
+            'sort_keys': SORT_KEYS,
+            'stats': render_stats(profile.stats_path, sort),
+            'memory': memory,
+        }
+        return TemplateResponse(
+            request, 'admin/profiler/requestprofile/stats.html', context
+        )
+
+    def download_view(self, request, pk, kind):
+        profile = self.get_profile(request, pk)
+        if kind == 'prof':
+            response = HttpResponse(
+                profile.stats_path.read_bytes(),
+                content_type='application/octet-stream'
+            )
+        elif kind == 'collapsed':
+            response = HttpResponse(
+                collapse_stacks(profile.stats_path),
+                content_type='text/plain; charset=utf-8'
+            )
+        else:
+            raise Http404
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{profile.pk}.{kind}"'
+        )
+        return response
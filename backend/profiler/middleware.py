@@ -0,0 +1,92 @@
+import cProfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from .models import RequestProfile
+from .utils import enforce_retention, render_memory
+
+MEMORY_MODE = 'memory'
+
+
+class ProfilerMiddleware:
+    """Профилирование отдельного запроса по заголовку или параметру.
+
+    Профиль снимается, только если запрос содержит заголовок
+    ``X-Profile`` или параметр ``?profile`` и исходит от сотрудника.
+    Значение ``memory`` дополнительно включает tracemalloc. Для остальных
+    запросов мидлварь ограничивается проверкой двух строк.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILER_HEADER.upper().replace(
+            '-', '_'
+        )
+        self.param = settings.PROFILER_QUERY_PARAM
+
+    def __call__(self, request):
+        mode = self.get_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return self.profile(request, user, mode == MEMORY_MODE)
+
+    def get_mode(self, request):
+        mode = request.META.get(self.header)
+        if mode is not None:
+            return mode
+        if self.param not in request.META.get('QUERY_STRING', ''):
+            return None
+        return request.GET.get(self.param)
+
+    @staticmethod
+    def get_staff_user(request):
+        user = request.user
+        if not user.is_authenticated:
+            try:
+                auth = TokenAuthentication().authenticate(Request(request))
+            except AuthenticationFailed:
+                return None
+            if auth is None:
+                return None
+            user = auth[0]
+        return user if user.is_staff else None
+
+    def profile(self, request, user, with_memory):
+        with_memory = with_memory and not tracemalloc.is_tracing()
+        if with_memory:
+            tracemalloc.start(settings.PROFILER_TRACEMALLOC_FRAMES)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            snapshot = None
+            if with_memory:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+        record = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            status_code=response.status_code,
+            duration=duration,
+            has_memory=with_memory
+        )
+        record.stats_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(record.stats_path)
+        if snapshot is not None:
+            record.memory_path.write_text(
+                render_memory(snapshot), encoding='utf-8'
+            )
+        enforce_retention()
+        response['X-Profile-Id'] = str(record.pk)
+        return response
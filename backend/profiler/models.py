@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models
+from users.models import User
+
+
+class RequestProfile(models.Model):
+    """Сохранённый профиль одного запроса."""
+
+    created = models.DateTimeField(
+        'Время записи',
+        auto_now_add=True,
+        db_index=True
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='request_profiles',
+        verbose_name='Пользователь'
+    )
+    method = models.CharField('Метод', max_length=8)
+    path = models.CharField('Путь', max_length=2048)
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Длительность, мс')
+    has_memory = models.BooleanField(
+        'Отслеживание памяти',
+        default=False
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.0f} мс)'
+
+    @property
+    def stats_path(self):
+        return Path(settings.PROFILER_DIR) / f'{self.pk}.prof'
+
+    @property
+    def memory_path(self):
+        return Path(settings.PROFILER_DIR) / f'{self.pk}.mem.txt'
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import RequestProfile
+
+
+@receiver(post_delete, sender=RequestProfile)
+def remove_profile_files(sender, instance, **kwargs):
+    for path in (instance.stats_path, instance.memory_path):
+        path.unlink(missing_ok=True)
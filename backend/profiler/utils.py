@@ -0,0 +1,102 @@
+import io
+import pstats
+import tracemalloc
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import RequestProfile
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+MIN_BRANCH_TIME = 1e-4
+
+
+def frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({filename}:{line})'
+
+
+def render_stats(path, sort='cumulative', limit=100):
+    """Текстовый отчёт pstats, отсортированный по выбранному ключу."""
+    if sort not in SORT_KEYS:
+        sort = SORT_KEYS[0]
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def collapse_stacks(path):
+    """Стеки в формате collapsed (flamegraph.pl, speedscope).
+
+    cProfile хранит только рёбра вызывающий -> вызываемый, поэтому стеки
+    восстанавливаются обходом графа от корней. Доля пути оценивается по
+    кумулятивному времени рёбер, а собственное время функции затем
+    нормируется так, чтобы сумма по всем её путям совпала с tottime.
+    """
+    stats = pstats.Stats(str(path)).stats
+    callees = defaultdict(list)
+    roots = []
+    for func, (_, calls, _, _, callers) in stats.items():
+        # Вызовы, не учтённые ни одним ребром, пришли извне профиля.
+        external = calls - sum(edge[1] for edge in callers.values())
+        if external > 0:
+            roots.append((func, external / calls))
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    shares = defaultdict(float)
+    paths = []
+
+    def walk(func, stack, share, seen):
+        stack = stack + (frame_name(func),)
+        shares[func] += share
+        paths.append((stack, func, share))
+        for callee, edge_time in callees[func]:
+            callee_cumtime = stats[callee][3]
+            # Короткие ветви отбрасываются, иначе число путей в графе
+            # вызовов Django растёт экспоненциально.
+            if (callee in seen or not callee_cumtime
+                    or share * edge_time < MIN_BRANCH_TIME):
+                continue
+            walk(
+                callee, stack, share * min(edge_time / callee_cumtime, 1),
+                seen | {callee}
+            )
+
+    for root, share in roots:
+        walk(root, (), share, {root})
+    lines = defaultdict(int)
+    for stack, func, share in paths:
+        own = int(stats[func][2] * share / shares[func] * 1_000_000)
+        if own:
+            lines[';'.join(stack)] += own
+    return ''.join(
+        f'{stack} {value}\n' for stack, value in sorted(lines.items())
+    )
+
+
+def render_memory(snapshot, limit=50):
+    """Топ мест выделения памяти из снимка tracemalloc."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    lines = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(
+            f'{stat.size / 1024:10.1f} KiB {stat.count:8d} блоков  '
+            f'{frame.filename}:{frame.lineno}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def enforce_retention():
+    """Удаляет профили сверх PROFILER_MAX_PROFILES вместе с файлами."""
+    stale = RequestProfile.objects.values_list(
+        'pk', flat=True
+    )[settings.PROFILER_MAX_PROFILES:]
+    for profile in RequestProfile.objects.filter(pk__in=list(stale)):
+        profile.delete()
@@ -1,44 +1,98 @@
 from django.contrib import admin
+from django.db.models import Exists, OuterRef
+from foodgram_backend.admin import AutocompleteMixin, ScalableAdmin
 
-from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingCart, Tag)
+from .trending import count_of
 
 
-class IngredientsInLine(admin.TabularInline):
-    model = Recipe.ingredients.through
+class IngredientsInLine(AutocompleteMixin, admin.TabularInline):
+    model = RecipeIngredient
+    autocomplete_fields = ['ingredient']
+    extra = 1
+
+
+class TagsInLine(AutocompleteMixin, admin.TabularInline):
+    model = RecipeTag
+    autocomplete_fields = ['tag']
+    extra = 1
+
+
+class TagListFilter(admin.SimpleListFilter):
+    """Фильтр по тегу через EXISTS: без JOIN и DISTINCT по рецептам."""
+
+    title = 'Теги'
+    parameter_name = 'tag'
+
+    def lookups(self, request, model_admin):
+        return Tag.objects.values_list('slug', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag__slug=self.value()
+        )))
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['user', 'recipe']
-    search_fields = ['user__username', 'user__email']
+    search_fields = ['^user__username', '^user__email']
+    autocomplete_fields = ['user', 'recipe']
     empty_value_display = '-пусто-'
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['name', 'measurement_unit']
-    search_fields = ['name']
+    search_fields = ['^name']
     empty_value_display = '-пусто-'
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['name', 'author', 'favorites']
-    search_fields = ['name', 'author__username']
-    list_filter = ['tags']
+    search_fields = ['^name', '^author__username']
+    list_filter = [TagListFilter]
+    autocomplete_fields = ['author']
     empty_value_display = '-пусто-'
     inlines = (
         IngredientsInLine,
+        TagsInLine,
     )
 
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк страницы, в отличие от
+        # GROUP BY по всей таблице.
+        return super().get_queryset(request).annotate(
+            favorites_count=count_of(Favorite)
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Объединение двух поисков вместо OR через JOIN: каждый идёт по
+        # своему индексу, без просмотра всей таблицы рецептов.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        found = Recipe.objects.filter(
+            name__istartswith=search_term
+        ).order_by().values('pk').union(Recipe.objects.filter(
+            author__username__istartswith=search_term
+        ).order_by().values('pk'))
+        return queryset.filter(pk__in=found), False
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['user', 'recipe']
-    search_fields = ['user__username', 'user__email']
+    search_fields = ['^user__username', '^user__email']
+    autocomplete_fields = ['user', 'recipe']
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,229 @@
+import json
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Recipe, RecipeCard, RecipeIngredient
+
+state = threading.local()
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+AUTHOR_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+INGREDIENT_FIELDS = ('id', 'name', 'amount', 'measurement_unit')
+
+
+def payload(recipe):
+    """Независимая от зрителя часть ответа API о рецепте.
+
+    Рецепт должен быть загружен с автором, тегами и ингредиентами в
+    ``prefetched_ingredients``, как в ``recipes_with_relations``.
+    """
+    return {
+        'id': recipe.pk,
+        'tags': [
+            {
+                'id': tag.pk,
+                'name': tag.name,
+                'color': tag.color,
+                'slug': tag.slug,
+            }
+            for tag in recipe.tags.all()
+        ],
+        'author': {
+            'id': recipe.author.pk,
+            'email': recipe.author.email,
+            'username': recipe.author.username,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'ingredients': [
+            {
+                'id': item.ingredient.pk,
+                'name': item.ingredient.name,
+                'amount': item.amount,
+                'measurement_unit': item.ingredient.measurement_unit,
+            }
+            for item in recipe.prefetched_ingredients
+        ],
+        'name': recipe.name,
+        'image': recipe.image.url if recipe.image else None,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def ordered(card_payload):
+    """Payload карточки с порядком ключей, как в ``payload``.
+
+    jsonb хранит ключи отсортированными, а ответ API должен совпадать
+    с ответом без карточек байт в байт.
+    """
+    return {
+        **card_payload,
+        'tags': [
+            {key: tag[key] for key in TAG_FIELDS}
+            for tag in card_payload['tags']
+        ],
+        'author': {
+            key: card_payload['author'][key] for key in AUTHOR_FIELDS
+        },
+        'ingredients': [
+            {key: item[key] for key in INGREDIENT_FIELDS}
+            for item in card_payload['ingredients']
+        ],
+    }
+
+
+def recipes_with_relations(recipe_ids):
+    return Recipe.objects.filter(pk__in=recipe_ids).select_related(
+        'author'
+    ).prefetch_related('tags', Prefetch(
+        'recipeingredient_set',
+        queryset=RecipeIngredient.objects.select_related('ingredient'),
+        to_attr='prefetched_ingredients'
+    ))
+
+
+def payloads(recipe_ids):
+    """Карточки рецептов одной пачкой запросов: {id: payload}."""
+    return {
+        recipe.pk: payload(recipe)
+        for recipe in recipes_with_relations(recipe_ids)
+    }
+
+
+def rows(recipes):
+    return [
+        (
+            recipe.pk, recipe.author_id, recipe.pub_date,
+            sorted(tag.pk for tag in recipe.tags.all()),
+            json.dumps(payload(recipe), ensure_ascii=False)
+        )
+        for recipe in recipes
+    ]
+
+
+def write(recipe_ids):
+    """Записывает карточки рецептов; карточки удалённых рецептов удаляет.
+
+    Изменённым рецептам заодно ставится updated_at: карточка меняется и
+    от тегов, ингредиентов и автора, а синхронизация каталога
+    (recipes.sync) ищет изменения по этому полю. INSERT ... ON CONFLICT
+    не даёт двум одновременным обновлениям одного рецепта столкнуться
+    на первичном ключе. Карточки есть только в PostgreSQL (см.
+    recipes.checks), на других базах ставится лишь updated_at.
+    """
+    recipe_ids = list(recipe_ids)
+    size = settings.RECIPE_CARDS_BATCH_SIZE
+    for start in range(0, len(recipe_ids), size):
+        chunk = recipe_ids[start:start + size]
+        Recipe.objects.filter(pk__in=chunk).update(updated_at=timezone.now())
+        if connection.vendor == 'postgresql':
+            write_chunk(chunk)
+
+
+def write_chunk(recipe_ids):
+    values = rows(recipes_with_relations(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {RecipeCard._meta.db_table} '
+            'WHERE recipe_id = ANY(%s) AND NOT recipe_id = ANY(%s)',
+            [recipe_ids, [row[0] for row in values]]
+        )
+        if not values:
+            return
+        cursor.execute(
+            f'''
+            INSERT INTO {RecipeCard._meta.db_table}
+                (recipe_id, author_id, pub_date, tag_ids, payload)
+            VALUES {', '.join(
+                ['(%s, %s, %s, %s::integer[], %s::jsonb)'] * len(values)
+            )}
+            ON CONFLICT (recipe_id) DO UPDATE SET
+                author_id = EXCLUDED.author_id,
+                pub_date = EXCLUDED.pub_date,
+                tag_ids = EXCLUDED.tag_ids,
+                payload = EXCLUDED.payload
+            ''',
+            [value for row in values for value in row]
+        )
+
+
+def changed(recipe_ids):
+    """Обновляет карточки в текущей транзакции или в конце ``deferred``."""
+    pending = getattr(state, 'pending', None)
+    if pending is not None:
+        pending.update(recipe_ids)
+    else:
+        write(recipe_ids)
+
+
+@contextmanager
+def deferred():
+    """Транзакция, в которой карточки обновляются один раз в конце.
+
+    Запись рецепта с тегами и ингредиентами вызывает несколько
+    сигналов; внутри блока они только собирают id рецептов.
+    """
+    with transaction.atomic():
+        if getattr(state, 'pending', None) is not None:
+            yield
+            return
+        state.pending = set()
+        try:
+            yield
+            recipe_ids = state.pending
+        finally:
+            state.pending = None
+        if recipe_ids:
+            write(recipe_ids)
+
+
+def rebuild():
+    """Пересобирает все карточки. Возвращает число рецептов."""
+    RecipeCard.objects.exclude(
+        recipe_id__in=Recipe.objects.values('pk')
+    ).delete()
+    recipe_ids = list(Recipe.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ))
+    size = settings.RECIPE_CARDS_BATCH_SIZE
+    for start in range(0, len(recipe_ids), size):
+        with transaction.atomic():
+            write_chunk(recipe_ids[start:start + size])
+    return len(recipe_ids)
+
+
+def verify():
+    """Сверяет карточки с рецептами.
+
+    Возвращает id рецептов без карточки, с устаревшей карточкой и
+    карточек без рецепта.
+    """
+    missing, stale = [], []
+    recipe_ids = list(Recipe.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ))
+    size = settings.RECIPE_CARDS_BATCH_SIZE
+    for start in range(0, len(recipe_ids), size):
+        chunk = recipe_ids[start:start + size]
+        cards = {
+            card.pk: card for card in RecipeCard.objects.filter(pk__in=chunk)
+        }
+        for row in rows(recipes_with_relations(chunk)):
+            recipe_id, author_id, pub_date, tag_ids, data = row
+            card = cards.get(recipe_id)
+            if card is None:
+                missing.append(recipe_id)
+            elif (
+                card.author_id, card.pub_date, card.tag_ids, card.payload
+            ) != (author_id, pub_date, tag_ids, json.loads(data)):
+                stale.append(recipe_id)
+    orphaned = list(RecipeCard.objects.exclude(
+        recipe_id__in=Recipe.objects.values('pk')
+    ).values_list('pk', flat=True))
+    return missing, stale, orphaned
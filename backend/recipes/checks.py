@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from django.db import connection
+
+
+@register()
+def recipe_cards_check(app_configs, **kwargs):
+    """Карточки рецептов пишутся только в PostgreSQL.
+
+    На других базах таблица карточек остаётся пустой, и с RECIPE_CARDS
+    списки, карточка рецепта и синхронизация отдавали бы пустоту.
+    """
+    if settings.RECIPE_CARDS and connection.vendor != 'postgresql':
+        return [Error(
+            f'RECIPE_CARDS требует PostgreSQL, а база — {connection.vendor}.',
+            hint='Выключите RECIPE_CARDS или перейдите на PostgreSQL.',
+            id='recipes.E001',
+        )]
+    return []
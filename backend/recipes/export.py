@@ -0,0 +1,210 @@
+import json
+import os
+import shutil
+import time
+from itertools import chain
+
+import lance
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import models
+from users.models import Subscription
+
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingCart)
+
+EXPORTED_MODELS = (
+    Ingredient, Recipe, RecipeIngredient, RecipeTag, Favorite, ShoppingCart,
+    Subscription,
+)
+FORMATS = ('parquet', 'lance')
+WATERMARK_FILE = '_watermark.json'
+
+ARROW_TYPES = (
+    ((models.BooleanField,), pa.bool_()),
+    ((models.IntegerField, models.AutoField, models.ForeignKey), pa.int64()),
+    ((models.FloatField,), pa.float64()),
+    ((models.DateTimeField,), pa.timestamp('us', tz='UTC')),
+    ((models.CharField, models.TextField, models.FileField), pa.string()),
+)
+
+
+def table_name(model):
+    return model._meta.db_table
+
+
+def arrow_type(field):
+    for classes, arrow in ARROW_TYPES:
+        if isinstance(field, classes):
+            return arrow
+    raise TypeError(f'Нет типа Arrow для поля {field!r}')
+
+
+def columns_of(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def schema_of(model):
+    return pa.schema([
+        pa.field(field.attname, arrow_type(field), nullable=field.null)
+        for field in model._meta.concrete_fields
+    ])
+
+
+def batches(model, after, upto, batch_size):
+    """Строки модели с id в (after, upto] пачками RecordBatch.
+
+    ``iterator`` в PostgreSQL читает через серверный курсор, поэтому в
+    памяти одновременно не больше одной пачки.
+    """
+    schema = schema_of(model)
+    columns = columns_of(model)
+    rows = model.objects.filter(
+        id__gt=after, id__lte=upto
+    ).order_by('id').values_list(*columns).iterator(chunk_size=batch_size)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch_size:
+            yield to_batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield to_batch(chunk, schema)
+
+
+def to_batch(rows, schema):
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(column, type=field.type)
+            for column, field in zip(zip(*rows), schema)
+        ],
+        schema=schema
+    )
+
+
+def read_watermarks(output):
+    path = os.path.join(output, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_watermarks(output, watermarks):
+    path = os.path.join(output, WATERMARK_FILE)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(watermarks, file, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def write_parquet(path, schema, source, after):
+    """Дописывает пачки отдельным файлом ``from-<after>.parquet``.
+
+    Имя файла определяется водяным знаком, поэтому повторный запуск после
+    сбоя перезаписывает недописанную часть, а не дублирует её.
+    """
+    os.makedirs(path, exist_ok=True)
+    name = f'from-{after:012d}.parquet'
+    target = os.path.join(path, name)
+    # Точка в начале имени скрывает недописанный файл от чтения датасета.
+    temporary = os.path.join(path, f'.{name}.tmp')
+    rows = 0
+    with pq.ParquetWriter(temporary, schema) as writer:
+        for batch in source:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    if rows:
+        os.replace(temporary, target)
+    else:
+        os.remove(temporary)
+    return rows, None
+
+
+def write_lance(path, schema, source, after, version):
+    """Дописывает пачки в датасет Lance.
+
+    Если прошлый запуск успел дописать строки, но не сохранил водяной
+    знак, версия датасета будет новее записанной — такие строки
+    удаляются перед дозаписью.
+    """
+    dataset = lance.dataset(path) if os.path.exists(path) else None
+    if dataset is not None and dataset.version != version:
+        dataset.delete(f'id > {after}')
+        version = dataset.version
+    first = next(source, None)
+    if first is None:
+        return 0, version
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in chain([first], source):
+            rows += batch.num_rows
+            yield batch
+
+    dataset = lance.write_dataset(
+        pa.RecordBatchReader.from_batches(schema, counted()), path, schema,
+        mode='create' if dataset is None else 'append'
+    )
+    return rows, dataset.version
+
+
+def settled_max_ids():
+    """max(id) выгружаемых таблиц, которые уже не получат строк меньше.
+
+    id выдаётся до фиксации транзакции, так что строка с меньшим id может
+    появиться после строки с большим. Время создания есть не у всех
+    таблиц, поэтому max(id) запоминаются заранее и выгрузка ждёт
+    ``SYNC_LAG`` секунд: транзакции, получившие эти id, к тому времени
+    зафиксированы (см. recipes.sync).
+    """
+    max_ids = {
+        model: model.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        for model in EXPORTED_MODELS
+    }
+    time.sleep(settings.SYNC_LAG)
+    return max_ids
+
+
+def export(output, formats, batch_size, full=False):
+    """Выгружает таблицы каталога и активности в колоночные форматы.
+
+    Строки выгружаются по возрастанию id начиная с водяного знака
+    прошлого запуска; ``full`` начинает выгрузку заново. Водяной знак
+    сохраняется после каждой таблицы. Изменения и удаления уже
+    выгруженных строк не переносятся — для них нужна полная выгрузка.
+    Возвращает словарь {формат: {таблица: число строк}}.
+    """
+    os.makedirs(output, exist_ok=True)
+    watermarks = read_watermarks(output)
+    max_ids = settled_max_ids()
+    exported = {}
+    for output_format in formats:
+        if full:
+            watermarks[output_format] = {}
+        marks = watermarks.setdefault(output_format, {})
+        exported[output_format] = {}
+        for model in EXPORTED_MODELS:
+            name = table_name(model)
+            path = os.path.join(output, output_format, name)
+            if full and os.path.exists(path):
+                shutil.rmtree(path)
+            mark = marks.get(name, {'id': 0, 'version': None})
+            upto = max_ids[model]
+            source = batches(model, mark['id'], upto, batch_size)
+            if output_format == 'parquet':
+                rows, version = write_parquet(
+                    path, schema_of(model), source, mark['id']
+                )
+            else:
+                rows, version = write_lance(
+                    path, schema_of(model), source, mark['id'],
+                    mark['version']
+                )
+            marks[name] = {'id': max(upto, mark['id']), 'version': version}
+            write_watermarks(output, watermarks)
+            exported[output_format][name] = rows
+    return exported
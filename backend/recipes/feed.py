@@ -0,0 +1,175 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from users.models import Subscription, User
+
+from .models import FeedEntry, Recipe
+
+REBUILD_AUTHORS_CHUNK = 500
+
+
+def entries_for(recipes, user_ids):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            recipe_id=recipe['id'],
+            author_id=recipe['author_id'],
+            pub_date=recipe['pub_date']
+        )
+        for recipe in recipes
+        for user_id in user_ids
+    ]
+
+
+def lock_author(author_id):
+    """Блокирует строку автора до конца транзакции.
+
+    Раскладка рецепта и backfill новой подписки на того же автора идут
+    по очереди. Иначе подписка, зафиксированная между чтением подписчиков
+    в fan_out и его фиксацией, не получит рецепт: backfill ещё не видит
+    ``fanned_out``, а fan_out уже не видит подписку. FOR NO KEY UPDATE не
+    мешает вставлять строки со ссылкой на автора.
+    """
+    list(User.objects.select_for_update(no_key=True).filter(
+        pk=author_id
+    ).values_list('pk', flat=True))
+
+
+@transaction.atomic
+def fan_out(recipe_id):
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не
+    раскладываются и подмешиваются в ленту при чтении.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if recipe is None:
+        return
+    lock_author(recipe['author_id'])
+    followers = list(Subscription.objects.filter(
+        author_id=recipe['author_id']
+    ).values_list('user_id', flat=True)[:settings.FEED_FANOUT_LIMIT + 1])
+    if len(followers) > settings.FEED_FANOUT_LIMIT:
+        return
+    Recipe.objects.filter(pk=recipe_id).update(fanned_out=True)
+    FeedEntry.objects.bulk_create(
+        entries_for([recipe], followers),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_sql(author_ids):
+    """Раскладка рецептов авторов одним INSERT ... SELECT."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {FeedEntry._meta.db_table}
+                (user_id, recipe_id, author_id, pub_date)
+            SELECT s.user_id, r.id, r.author_id, r.pub_date
+            FROM {Recipe._meta.db_table} r
+            JOIN {Subscription._meta.db_table} s
+                ON s.author_id = r.author_id
+            WHERE r.author_id = ANY(%s)
+            ''',
+            [author_ids]
+        )
+
+
+def fan_out_orm(author_ids):
+    recipes = defaultdict(list)
+    for recipe in Recipe.objects.filter(author_id__in=author_ids).values(
+        'id', 'author_id', 'pub_date'
+    ):
+        recipes[recipe['author_id']].append(recipe)
+    followers = defaultdict(list)
+    for author_id, user_id in Subscription.objects.filter(
+        author_id__in=author_ids
+    ).values_list('author_id', 'user_id'):
+        followers[author_id].append(user_id)
+    entries = (
+        entry
+        for author_id in author_ids
+        for entry in entries_for(recipes[author_id], followers[author_id])
+    )
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch)
+
+
+def rebuild():
+    """Пересобирает ленты всех пользователей с нуля.
+
+    Возвращает число авторов, чьи рецепты разложены по лентам.
+    """
+    FeedEntry.objects.all().delete()
+    Recipe.objects.filter(fanned_out=True).update(fanned_out=False)
+    authors = list(Subscription.objects.values('author_id').annotate(
+        followers=Count('id')
+    ).filter(followers__lte=settings.FEED_FANOUT_LIMIT).values_list(
+        'author_id', flat=True
+    ))
+    for start in range(0, len(authors), REBUILD_AUTHORS_CHUNK):
+        chunk = authors[start:start + REBUILD_AUTHORS_CHUNK]
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                fan_out_sql(chunk)
+            else:
+                fan_out_orm(chunk)
+            Recipe.objects.filter(author_id__in=chunk).update(fanned_out=True)
+    return len(authors)
+
+
+@transaction.atomic
+def backfill(user_id, author_id):
+    """Добавляет в ленту новой подписки разосланные рецепты автора."""
+    lock_author(author_id)
+    recipes = Recipe.objects.filter(
+        author_id=author_id, fanned_out=True
+    ).values('id', 'author_id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        entries_for(recipes, [user_id]),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def before(queryset, cursor, date_field, id_field):
+    if cursor is None:
+        return queryset
+    pub_date, recipe_id = cursor
+    return queryset.filter(
+        Q(**{f'{date_field}__lt': pub_date})
+        | Q(**{date_field: pub_date, f'{id_field}__lt': recipe_id})
+    )
+
+
+def timeline(user, cursor, limit):
+    """Страница ленты: список (pub_date, recipe_id) новее курсора.
+
+    Объединяет разложенные записи FeedEntry с неразложенными рецептами
+    авторов, на которых подписан пользователь. Возвращает limit + 1
+    элементов, если за страницей есть продолжение.
+    """
+    entries = before(
+        FeedEntry.objects.filter(user=user), cursor, 'pub_date', 'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit + 1]
+    pulled = before(
+        Recipe.objects.filter(fanned_out=False, author__author__user=user),
+        cursor, 'pub_date', 'id'
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit + 1]
+    return sorted(set(entries) | set(pulled), reverse=True)[:limit + 1]
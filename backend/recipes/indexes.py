@@ -0,0 +1,401 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DeletedRecipe, Recipe, RecipeIngredient, RecipeTag
+
+
+def load_features(recipe_ids=None):
+    """Пары (рецепт, признак) из ингредиентов и тегов рецептов.
+
+    Признак ингредиента кодируется как ``2 * id``, тега — ``2 * id + 1``,
+    так что оба вида помещаются в одно пространство признаков.
+    """
+    ingredients = RecipeIngredient.objects.all()
+    tags = RecipeTag.objects.all()
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    pairs = [
+        np.array(
+            list(queryset.values_list('recipe_id', field)), dtype=np.int64
+        ).reshape(-1, 2)
+        for queryset, field in (
+            (ingredients, 'ingredient_id'), (tags, 'tag_id')
+        )
+    ]
+    pairs[0][:, 1] *= 2
+    pairs[1][:, 1] = pairs[1][:, 1] * 2 + 1
+    return np.concatenate(pairs)
+
+
+def mark_recipes_dirty(recipe_ids):
+    """Помечает рецепты изменёнными во всех индексах процесса."""
+    for index in RecipeIndex.instances:
+        for recipe_id in recipe_ids:
+            index.mark_dirty(recipe_id)
+
+
+class RecipeChanges:
+    """Общий для индексов процесса водяной знак изменений рецептов.
+
+    Изменения из других процессов находятся по updated_at рецептов и
+    deleted_at записей DeletedRecipe новее прошлой проверки и помечаются
+    во всех индексах сразу, так что индексы не опрашивают базу каждый
+    сам. Время ставится до фиксации транзакции, поэтому проверка
+    захватывает ещё ``SYNC_LAG`` секунд назад, а уже помеченные в этом
+    окне изменения пропускает.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.seen = set()
+
+    @staticmethod
+    def since(moment):
+        """Пары (id, время) рецептов, изменённых или удалённых после
+        moment."""
+        return set(Recipe.objects.filter(
+            updated_at__gt=moment
+        ).values_list('id', 'updated_at')) | set(DeletedRecipe.objects.filter(
+            deleted_at__gt=moment
+        ).values_list('recipe_id', 'deleted_at'))
+
+    def poll(self):
+        with self.lock:
+            now = timezone.now()
+            if self.checked_at is None:
+                # Индексы ещё не построены и прочитают всё с нуля.
+                self.checked_at = now
+                return
+            changes = self.since(
+                self.checked_at - timedelta(seconds=settings.SYNC_LAG)
+            )
+            self.checked_at = now
+            mark_recipes_dirty(
+                {recipe_id for recipe_id, _ in changes - self.seen}
+            )
+            self.seen = changes
+
+
+recipe_changes = RecipeChanges()
+
+
+class RecipeIndex:
+    """Индекс по рецептам в памяти процесса.
+
+    Строится лениво при первом обращении и полностью перестраивается не
+    реже раза в ``RECIPE_INDEX_REBUILD_INTERVAL`` секунд. Изменения,
+    сделанные в этом процессе, применяются точечно через ``mark_dirty``,
+    изменения из других процессов помечает ``recipe_changes``.
+    """
+
+    instances = []
+
+    def __init__(self):
+        self.instances.append(self)
+        self.lock = threading.Lock()
+        self.built_at = None
+        self.dirty = set()
+
+    def mark_dirty(self, recipe_id):
+        with self.lock:
+            self.dirty.add(recipe_id)
+
+    def ensure(self):
+        # До блокировки индекса: poll сам берёт блокировки всех индексов.
+        recipe_changes.poll()
+        with self.lock:
+            expired = (
+                self.built_at is None
+                or time.monotonic() - self.built_at
+                > settings.RECIPE_INDEX_REBUILD_INTERVAL
+            )
+            if expired:
+                self.dirty.clear()
+                self.build(load_features())
+                self.built_at = time.monotonic()
+                return
+            if self.dirty:
+                dirty = sorted(self.dirty)
+                self.dirty.clear()
+                existing = set(Recipe.objects.filter(
+                    id__in=dirty
+                ).values_list('id', flat=True))
+                self.update(dirty, existing, load_features(existing))
+
+    def build(self, pairs):
+        raise NotImplementedError
+
+    def update(self, recipe_ids, existing, pairs):
+        raise NotImplementedError
+
+
+class SimilarityIndex(RecipeIndex):
+    """Разреженная матрица рецепт x признак для поиска похожих рецептов.
+
+    Матрица хранится в двух видах: по строкам (признаки рецепта) и по
+    столбцам (рецепты с признаком). Пересечение запроса со всеми рецептами
+    считается одним ``np.bincount`` по спискам рецептов его признаков,
+    сходство — взвешенный коэффициент Жаккара. Изменённые рецепты
+    исключаются из матрицы и хранятся отдельно, пока их не станет больше
+    ``SIMILAR_RECIPES_COMPACT_THRESHOLD``.
+    """
+
+    def build(self, pairs):
+        ids = np.array(
+            Recipe.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        pairs = pairs[np.isin(pairs[:, 0], ids)]
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        self.set_matrix(ids, pairs)
+        self.overrides = {}
+
+    def set_matrix(self, ids, pairs):
+        self.ids = ids
+        rows = np.searchsorted(ids, pairs[:, 0])
+        features = pairs[:, 1]
+        self.row_ptr = np.searchsorted(rows, np.arange(len(ids) + 1))
+        self.row_features = features
+        self.sizes = np.bincount(
+            rows, weights=self.weights(features), minlength=len(ids)
+        )
+        order = np.argsort(features, kind='stable')
+        width = int(features.max()) + 2 if len(features) else 1
+        self.feature_ptr = np.searchsorted(
+            features[order], np.arange(width)
+        )
+        self.feature_rows = rows[order]
+        self.alive = np.ones(len(ids), dtype=bool)
+
+    @staticmethod
+    def weights(features):
+        return np.where(
+            features % 2, settings.SIMILAR_RECIPES_TAG_WEIGHT, 1.0
+        )
+
+    def update(self, recipe_ids, existing, pairs):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, recipe_ids)
+        inside = positions < len(self.ids)
+        positions = positions[inside]
+        known = positions[self.ids[positions] == recipe_ids[inside]]
+        self.alive[known] = False
+        for recipe_id in recipe_ids.tolist():
+            self.overrides.pop(recipe_id, None)
+        for recipe_id in existing:
+            self.overrides[recipe_id] = np.unique(
+                pairs[pairs[:, 0] == recipe_id, 1]
+            )
+        if len(self.overrides) > settings.SIMILAR_RECIPES_COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        """Вливает отложенные изменения обратно в матрицу."""
+        rows = np.repeat(np.arange(len(self.ids)), np.diff(self.row_ptr))
+        keep = self.alive[rows]
+        pairs = [np.column_stack(
+            (self.ids[rows[keep]], self.row_features[keep])
+        )]
+        for recipe_id, features in self.overrides.items():
+            pairs.append(np.column_stack(
+                (np.full(len(features), recipe_id), features)
+            ))
+        pairs = np.concatenate(pairs)
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        ids = np.union1d(self.ids[self.alive], list(self.overrides))
+        self.set_matrix(ids.astype(np.int64), pairs)
+        self.overrides = {}
+
+    def features_of(self, recipe_id):
+        if recipe_id in self.overrides:
+            return self.overrides[recipe_id]
+        position = np.searchsorted(self.ids, recipe_id)
+        if (position == len(self.ids) or self.ids[position] != recipe_id
+                or not self.alive[position]):
+            return None
+        return self.row_features[
+            self.row_ptr[position]:self.row_ptr[position + 1]
+        ]
+
+    def similar(self, recipe_id, limit):
+        """Список (id, сходство) похожих рецептов или None."""
+        self.ensure()
+        with self.lock:
+            return self.query(recipe_id, limit)
+
+    def query(self, recipe_id, limit):
+        features = self.features_of(recipe_id)
+        if features is None:
+            return None
+        weights = self.weights(features)
+        size = weights.sum()
+        width = len(self.feature_ptr) - 1
+        postings = [
+            (self.feature_rows[
+                self.feature_ptr[feature]:self.feature_ptr[feature + 1]
+            ], weight)
+            for feature, weight in zip(features, weights)
+            if feature < width
+        ]
+        if postings:
+            rows = np.concatenate([posting for posting, _ in postings])
+            row_weights = np.concatenate([
+                np.full(len(posting), weight) for posting, weight in postings
+            ])
+            shared = np.bincount(
+                rows, weights=row_weights, minlength=len(self.ids)
+            )
+        else:
+            shared = np.zeros(len(self.ids))
+        scores = shared / np.maximum(self.sizes + size - shared, 1e-9)
+        scores[~self.alive | (shared == 0)] = 0
+        scores[self.ids == recipe_id] = 0
+        candidates = []
+        if len(scores):
+            # Порог — limit-е по величине значение; все равные ему строки
+            # попадают в выборку, чтобы порядок при равенстве был стабильным.
+            kth = np.partition(scores, max(len(scores) - limit, 0))[
+                max(len(scores) - limit, 0)
+            ]
+            rows = np.flatnonzero(scores >= max(kth, 1e-12))
+            rows = rows[np.lexsort((-self.ids[rows], -scores[rows]))][:limit]
+            candidates = [
+                (int(self.ids[row]), float(scores[row])) for row in rows
+            ]
+        for other_id, other in self.overrides.items():
+            if other_id == recipe_id:
+                continue
+            common = np.intersect1d(features, other, assume_unique=True)
+            if not len(common):
+                continue
+            inter = self.weights(common).sum()
+            other_size = self.weights(other).sum()
+            candidates.append((other_id, inter / (size + other_size - inter)))
+        candidates.sort(key=lambda item: (-item[1], -item[0]))
+        return candidates[:limit]
+
+
+similarity_index = SimilarityIndex()
+
+
+def popcount(words):
+    """Число единичных битов в каждом uint64 (SWAR, без цикла по битам)."""
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + (
+        (words >> np.uint64(2)) & np.uint64(0x3333333333333333)
+    )
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (words * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def set_bits(matrix, rows, bits):
+    """Ставит в матрице слов uint64 бит bits[i] в строке rows[i]."""
+    np.bitwise_or.at(
+        matrix, (rows, bits >> 6),
+        np.left_shift(np.uint64(1), (bits & 63).astype(np.uint64))
+    )
+
+
+def words_for(bits):
+    return int(bits.max()) // 64 + 1 if len(bits) else 1
+
+
+def mask_of(bits, width):
+    bits = np.asarray(bits, dtype=np.int64)
+    bits = bits[(bits >= 0) & (bits < width * 64)]
+    mask = np.zeros((1, width), dtype=np.uint64)
+    set_bits(mask, np.zeros(len(bits), dtype=np.int64), bits)
+    return mask[0]
+
+
+class PantryIndex(RecipeIndex):
+    """Битовые множества ингредиентов и тегов рецептов.
+
+    Бит ингредиента (тега) — его id, строка матрицы — рецепт. Число
+    недостающих ингредиентов считается для всех рецептов сразу как
+    popcount(рецепт & ~имеющиеся). Изменённые рецепты перезаписываются
+    на месте, новые дописываются в конец.
+    """
+
+    def build(self, pairs):
+        self.ids = np.array(
+            Recipe.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        self.ingredients = np.zeros((len(self.ids), 1), dtype=np.uint64)
+        self.tags = np.zeros((len(self.ids), 1), dtype=np.uint64)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.fill(pairs)
+
+    def fill(self, pairs):
+        pairs = pairs[np.isin(pairs[:, 0], self.ids)]
+        rows = np.searchsorted(self.ids, pairs[:, 0])
+        for kind, name in ((0, 'ingredients'), (1, 'tags')):
+            selected = pairs[:, 1] % 2 == kind
+            bits = pairs[selected, 1] // 2
+            matrix = getattr(self, name)
+            grow = words_for(bits) - matrix.shape[1]
+            if grow > 0:
+                matrix = np.pad(matrix, ((0, 0), (0, grow)))
+                setattr(self, name, matrix)
+            set_bits(matrix, rows[selected], bits)
+
+    def update(self, recipe_ids, existing, pairs):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        new = np.setdiff1d(
+            np.asarray(list(existing), dtype=np.int64), self.ids
+        )
+        if len(new):
+            self.ids = np.concatenate([self.ids, new])
+            order = np.argsort(self.ids, kind='stable')
+            self.ids = self.ids[order]
+            self.alive = np.concatenate([
+                self.alive, np.ones(len(new), dtype=bool)
+            ])[order]
+            for name in ('ingredients', 'tags'):
+                matrix = getattr(self, name)
+                setattr(self, name, np.concatenate([
+                    matrix, np.zeros((len(new), matrix.shape[1]), np.uint64)
+                ])[order])
+        rows = np.searchsorted(self.ids, recipe_ids)
+        rows = rows[rows < len(self.ids)]
+        rows = rows[np.isin(self.ids[rows], recipe_ids)]
+        self.ingredients[rows] = 0
+        self.tags[rows] = 0
+        self.alive[rows] = np.isin(self.ids[rows], list(existing))
+        self.fill(pairs)
+
+    def cookable(self, ingredient_ids, missing=0, tag_ids=None):
+        """id рецептов, которым не хватает не больше missing ингредиентов.
+
+        С tag_ids остаются только рецепты хотя бы с одним из тегов.
+        """
+        self.ensure()
+        with self.lock:
+            pantry = mask_of(ingredient_ids, self.ingredients.shape[1])
+            lacking = self.ingredients & ~pantry
+            # Каждое ненулевое слово — хотя бы один недостающий
+            # ингредиент, так что popcount нужен лишь строкам, где таких
+            # слов не больше missing.
+            selected = self.alive & (
+                np.count_nonzero(lacking, axis=1) <= missing
+            )
+            if tag_ids:
+                tags = mask_of(tag_ids, self.tags.shape[1])
+                selected &= (self.tags & tags).any(axis=1)
+            if missing:
+                rows = np.flatnonzero(selected)
+                selected[rows] = (
+                    popcount(lacking[rows]).sum(axis=1) <= missing
+                )
+            return self.ids[selected]
+
+
+pantry_index = PantryIndex()
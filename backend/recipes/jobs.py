@@ -0,0 +1,118 @@
+import io
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from jobs.queue import enqueue, job
+
+from . import cards, feed, trending
+from .models import Recipe, RecipeIngredient
+from .signals import recipes_changed
+
+
+def shopping_list_text(user):
+    """Список покупок: ингредиенты из корзины с суммарным количеством."""
+    ingredients = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount'))
+    return ','.join(
+        f'{ingredient["ingredient__name"]} - '
+        f'{ingredient["amount"]} '
+        f'{ingredient["ingredient__measurement_unit"]}'
+        for ingredient in ingredients
+    )
+
+
+@job(name='recipes.shopping_list')
+def shopping_list(user_id):
+    """Сохраняет список покупок файлом и возвращает ссылку на него."""
+    name = default_storage.save(
+        f'shopping_lists/{uuid.uuid4().hex}.txt',
+        ContentFile(shopping_list_text(user_id).encode())
+    )
+    return {'file': default_storage.url(name)}
+
+
+# Форматы, которые пережимаются; остальные остаются как загружены.
+PROCESSED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+
+def save_options(image_format):
+    if image_format == 'JPEG':
+        return {'quality': settings.RECIPE_IMAGE_QUALITY, 'optimize': True}
+    if image_format == 'WEBP':
+        return {'quality': settings.RECIPE_IMAGE_QUALITY}
+    return {'optimize': True}
+
+
+@job(name='recipes.process_image')
+def process_image(recipe_id, name):
+    """Уменьшает и пережимает загруженное изображение рецепта.
+
+    Поворачивает по EXIF и убирает метаданные. Формат, режим и
+    прозрачность остаются исходными; анимации и другие форматы не
+    трогаются. Если изображение рецепта уже сменилось или уже обработано,
+    ничего не делает. Исходный файл удаляется через
+    RECIPE_IMAGE_DELETE_DELAY: его адрес ещё может быть в ответах,
+    полученных клиентами до замены.
+    """
+    # ImageOps нужен только обработчику очереди, не веб-воркерам.
+    from PIL import Image, ImageOps
+
+    if not Recipe.objects.filter(pk=recipe_id, image=name).exists():
+        return {'skipped': True}
+    size = settings.RECIPE_IMAGE_MAX_SIZE
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image_format = image.format
+        if image_format not in PROCESSED_FORMATS \
+                or getattr(image, 'is_animated', False) \
+                or max(image.size) <= size and not image.getexif():
+            return {'skipped': True}
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size))
+    image.info.pop('exif', None)
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **save_options(image_format))
+    processed = default_storage.save(name, ContentFile(buffer.getvalue()))
+    # update() не вызывает сигналов, поэтому задача не поставится снова.
+    if Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image=processed
+    ):
+        enqueue(
+            'recipes.delete_image', {'name': name},
+            delay=settings.RECIPE_IMAGE_DELETE_DELAY
+        )
+        recipes_changed([recipe_id])
+    else:
+        default_storage.delete(processed)
+    return {'image': processed, 'size': list(image.size)}
+
+
+@job(name='recipes.delete_image')
+def delete_image(name):
+    """Удаляет файл изображения, если на него не ссылается ни один рецепт."""
+    if Recipe.objects.filter(image=name).exists():
+        return {'skipped': True}
+    default_storage.delete(name)
+    return {'deleted': name}
+
+
+@job(name='recipes.rebuild_feed', max_attempts=1)
+def rebuild_feed():
+    return {'authors': feed.rebuild()}
+
+
+@job(name='recipes.rebuild_cards', max_attempts=1)
+def rebuild_cards():
+    return {'recipes': cards.rebuild()}
+
+
+@job(name='recipes.renormalize_trending')
+def renormalize_trending(rebuild=False):
+    trending.renormalize(rebuild=rebuild)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from recipes.export import FORMATS, export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузка рецептов, ингредиентов, избранного, корзин и подписок '
+        'в Parquet и/или Lance для аналитики. Повторный запуск дописывает '
+        'только строки, появившиеся после прошлой выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Каталог выгрузки.')
+        parser.add_argument(
+            '--format', action='append', choices=FORMATS, dest='formats',
+            help='Формат (можно несколько). По умолчанию parquet.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50000,
+            help='Строк в одной пачке (RecordBatch).'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Удалить прошлую выгрузку и выгрузить всё заново.'
+        )
+
+    def handle(self, *args, **options):
+        exported = export(
+            options['output'], options['formats'] or ['parquet'],
+            options['batch_size'], full=options['full']
+        )
+        for output_format, tables in exported.items():
+            for name, rows in tables.items():
+                self.stdout.write(f'{output_format:8} {name:32} {rows:>10}')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
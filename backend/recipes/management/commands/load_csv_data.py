@@ -1,5 +1,6 @@
 import csv
 
+from api.reference import ingredients_data
 from django.core.management.base import BaseCommand
 from foodgram_backend.settings import CSV_FILES_DIR
 from recipes.models import Ingredient
@@ -22,3 +23,5 @@ class Command(BaseCommand):
                 for row in reader
             ]
             Ingredient.objects.bulk_create(ingredients)
+        # bulk_create не посылает сигналов, поэтому сбрасываем явно.
+        ingredients_data.invalidate()
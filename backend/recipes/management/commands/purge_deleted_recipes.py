@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.sync import purge_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление записей об удалённых рецептах старше SYNC_RETENTION. '
+        'Запускать периодически, например раз в сутки.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено записей: {purge_deleted()}')
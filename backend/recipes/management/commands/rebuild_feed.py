@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from jobs.queue import enqueue
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок (FeedEntry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересборку в очередь фоновых задач.'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue('recipes.rebuild_feed')
+            self.stdout.write(f'Поставлена задача #{job.pk}')
+            return
+        authors = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересобраны, авторов: {authors}')
+        )
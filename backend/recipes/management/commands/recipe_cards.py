@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from jobs.queue import enqueue
+from recipes.cards import rebuild, verify
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка карточек рецептов (RecipeCard) с рецептами; с --rebuild — '
+        'пересборка. Завершается с ошибкой, если карточки расходятся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересобрать все карточки перед сверкой.'
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересборку в очередь фоновых задач.'
+        )
+        parser.add_argument(
+            '--no-verify', action='store_true',
+            help='Не сверять карточки после пересборки.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Карточки рецептов есть только в PostgreSQL.')
+        if options['enqueue']:
+            job = enqueue('recipes.rebuild_cards')
+            self.stdout.write(f'Поставлена задача #{job.pk}')
+            return
+        if options['rebuild']:
+            self.stdout.write(f'Карточек пересобрано: {rebuild()}')
+            if options['no_verify']:
+                return
+        missing, stale, orphaned = verify()
+        problems = [
+            f'{title}: {len(ids)} (например, {ids[:10]})'
+            for title, ids in (
+                ('без карточки', missing),
+                ('устаревших', stale),
+                ('карточек без рецепта', orphaned),
+            )
+            if ids
+        ]
+        if problems:
+            raise CommandError(
+                'Карточки расходятся с рецептами:\n' + '\n'.join(problems)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Карточки совпадают с рецептами.')
+        )
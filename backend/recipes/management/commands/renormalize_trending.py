@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from jobs.queue import enqueue
+from recipes.trending import renormalize
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос точки отсчёта популярности рецептов на текущий момент. '
+        'Запускать периодически, например раз в сутки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать счета из текущих избранного и корзин.'
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересчёт в очередь фоновых задач.'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue(
+                'recipes.renormalize_trending',
+                {'rebuild': options['rebuild']}
+            )
+            self.stdout.write(f'Поставлена задача #{job.pk}')
+            return
+        renormalize(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS('Готово.'))
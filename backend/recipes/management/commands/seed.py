@@ -0,0 +1,362 @@
+import csv
+import io
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+from const import MAX_AMOUNT, MIN_AMOUNT, MIN_COOKING_TIME
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from users.models import Subscription, User
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Быстро', '#2D9CDB', 'quick'),
+    ('Вегетарианское', '#27AE60', 'vegetarian'),
+)
+WORDS = (
+    'нарезать', 'обжарить', 'добавить', 'посолить', 'перемешать', 'варить',
+    'запекать', 'остудить', 'подавать', 'минут', 'до', 'готовности', 'на',
+    'среднем', 'огне', 'с', 'зеленью', 'лук', 'морковь', 'масло', 'соус',
+    'тесто', 'духовке', 'сковороде', 'кастрюле', 'кусочками', 'мелко',
+)
+PLACEHOLDER_COLORS = (
+    '#E26C2D', '#49B64E', '#8775D2', '#F2C94C', '#2D9CDB', '#EB5757',
+    '#BB6BD9', '#6FCF97',
+)
+PLACEHOLDER_DIR = 'recipes/images'
+MAX_SEED_COOKING_TIME = 180
+PASSWORD = 'seed-password'
+
+
+def long_tail(rng, size, mean, sigma=1.0):
+    """Целые >= 0 из логнормального распределения с заданным средним."""
+    if mean <= 0:
+        return np.zeros(size, dtype=np.int64)
+    mu = np.log(mean) - sigma ** 2 / 2
+    return np.floor(rng.lognormal(mu, sigma, size)).astype(np.int64)
+
+
+def zipf_weights(rng, size, exponent):
+    """Веса популярности по закону Ципфа в случайном порядке."""
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def unique_pairs(left, right, width):
+    """Убирает повторяющиеся пары (left, right); результат упорядочен."""
+    keys = np.unique(left * width + right)
+    return keys // width, keys % width
+
+
+class Command(BaseCommand):
+    help = 'Генерация воспроизводимого синтетического набора данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--recipes-per-user', type=float, default=5,
+            help='Среднее число рецептов на пользователя.'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=float, default=8,
+            help='Среднее число ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--tags-per-recipe', type=int, default=2,
+            help='Максимальное число тегов у рецепта.'
+        )
+        parser.add_argument(
+            '--favorites-per-user', type=float, default=20,
+            help='Среднее число рецептов в избранном.'
+        )
+        parser.add_argument(
+            '--carts-per-user', type=float, default=3,
+            help='Среднее число рецептов в списке покупок.'
+        )
+        parser.add_argument(
+            '--subscriptions-per-user', type=float, default=5,
+            help='Среднее число подписок.'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён и почт создаваемых пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        if User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом "{self.prefix}" уже есть, '
+                'задайте другой --prefix.'
+            )
+        if not Ingredient.objects.exists():
+            call_command('load_csv_data')
+        ingredient_ids = np.array(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        tag_ids = self.ensure_tags()
+        images = self.ensure_placeholders()
+
+        user_ids = self.step('users', self.create_users, options['users'])
+        recipe_ids, authors = self.step(
+            'recipes', self.create_recipes, user_ids,
+            options['recipes_per_user'], images
+        )
+        self.step(
+            'recipe ingredients', self.create_recipe_ingredients,
+            recipe_ids, ingredient_ids, options['ingredients_per_recipe']
+        )
+        self.step(
+            'recipe tags', self.create_recipe_tags,
+            recipe_ids, tag_ids, options['tags_per_recipe']
+        )
+        popularity = zipf_weights(self.rng, len(recipe_ids), 1.1)
+        for model, mean in (
+            (Favorite, options['favorites_per_user']),
+            (ShoppingCart, options['carts_per_user']),
+        ):
+            self.step(
+                model._meta.model_name, self.create_user_recipe_links,
+                model, user_ids, recipe_ids, popularity, mean
+            )
+        self.step(
+            'subscriptions', self.create_subscriptions,
+            user_ids, authors, options['subscriptions_per_user']
+        )
+
+    def step(self, title, func, *args):
+        started = time.monotonic()
+        result = func(*args)
+        self.stdout.write(
+            f'{title}: {time.monotonic() - started:.1f} с'
+        )
+        return result
+
+    def ensure_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        return np.array(
+            Tag.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def ensure_placeholders(self):
+        from PIL import Image
+
+        directory = Path(settings.MEDIA_ROOT) / PLACEHOLDER_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        names = []
+        for number, color in enumerate(PLACEHOLDER_COLORS):
+            name = f'{PLACEHOLDER_DIR}/seed-placeholder-{number}.png'
+            path = Path(settings.MEDIA_ROOT) / name
+            if not path.exists():
+                Image.new('RGB', (480, 360), color).save(path)
+            names.append(name)
+        return names
+
+    def load(self, model, fields, rows):
+        """Пакетная загрузка строк: COPY в PostgreSQL, иначе bulk_create."""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.copy(model, fields, rows)
+                return
+            batch = []
+            for row in rows:
+                batch.append(model(**dict(zip(fields, row))))
+                if len(batch) >= self.batch_size:
+                    model.objects.bulk_create(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+
+    def copy(self, model, fields, rows):
+        # COPY не знает умолчаний моделей: поля с default передаются явно.
+        columns = ', '.join(
+            model._meta.get_field(field).column for field in fields
+        )
+        sql = (
+            f'COPY {model._meta.db_table} ({columns}) '
+            'FROM STDIN WITH (FORMAT csv)'
+        )
+        with connection.cursor() as cursor:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for number, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if number % self.batch_size == 0:
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+
+    def create_users(self, count):
+        last_id = self.last_id(User)
+        password = make_password(PASSWORD)
+        joined = timezone.now()
+        self.load(
+            User,
+            ['username', 'email', 'first_name', 'last_name', 'password',
+             'is_active', 'is_staff', 'is_superuser', 'date_joined'],
+            (
+                (f'{self.prefix}_{number}',
+                 f'{self.prefix}{number}@example.com',
+                 f'Имя{number}', f'Фамилия{number}', password,
+                 True, False, False, joined)
+                for number in range(count)
+            )
+        )
+        return np.array(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def create_recipes(self, user_ids, mean, images):
+        last_id = self.last_id(Recipe)
+        counts = long_tail(self.rng, len(user_ids), mean, sigma=1.5)
+        authors = np.repeat(user_ids, counts)
+        self.rng.shuffle(authors)
+        total = len(authors)
+        now = timezone.now()
+        offsets = np.sort(self.rng.integers(0, 365 * 24 * 3600, total))[::-1]
+        cooking_times = self.rng.integers(
+            MIN_COOKING_TIME, MAX_SEED_COOKING_TIME, total, endpoint=True
+        )
+        image_numbers = self.rng.integers(0, len(images), total)
+        text_lengths = self.rng.integers(10, 60, total)
+        words = np.array(WORDS)
+
+        def rows():
+            for number in range(total):
+                text = ' '.join(words[
+                    self.rng.integers(0, len(words), text_lengths[number])
+                ])
+                pub_date = now - timedelta(seconds=int(offsets[number]))
+                yield (
+                    int(authors[number]),
+                    f'Рецепт {number}',
+                    text.capitalize(),
+                    images[image_numbers[number]],
+                    int(cooking_times[number]),
+                    pub_date,
+                    pub_date,
+                    False,
+                    0.0,
+                )
+
+        self.load(
+            Recipe,
+            ['author_id', 'name', 'text', 'image', 'cooking_time',
+             'pub_date', 'updated_at', 'fanned_out', 'trending_score'],
+            rows()
+        )
+        recipes = Recipe.objects.filter(id__gt=last_id).order_by(
+            'id'
+        ).values_list('id', 'author_id')
+        recipes = np.array(list(recipes), dtype=np.int64).reshape(-1, 2)
+        if connection.vendor != 'postgresql':
+            # bulk_create ставит в auto_now_add и auto_now текущее время;
+            # id новых рецептов идут в порядке строк.
+            self.restore_dates(recipes[:, 0], now, offsets)
+        return recipes[:, 0], recipes[:, 1]
+
+    def restore_dates(self, recipe_ids, now, offsets):
+        dates = (
+            now - timedelta(seconds=int(offset)) for offset in offsets
+        )
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=int(recipe_id), pub_date=date, updated_at=date)
+                for recipe_id, date in zip(recipe_ids, dates)
+            ],
+            ['pub_date', 'updated_at'],
+            batch_size=self.batch_size
+        )
+
+    def create_recipe_ingredients(self, recipe_ids, ingredient_ids, mean):
+        counts = np.maximum(self.rng.poisson(mean, len(recipe_ids)), 1)
+        recipes = np.repeat(recipe_ids, counts)
+        ingredients = ingredient_ids[self.rng.choice(
+            len(ingredient_ids), len(recipes),
+            p=zipf_weights(self.rng, len(ingredient_ids), 0.8)
+        )]
+        recipes, ingredients = unique_pairs(
+            recipes, ingredients, ingredient_ids.max() + 1
+        )
+        amounts = self.rng.integers(
+            MIN_AMOUNT, MAX_AMOUNT, len(recipes), endpoint=True
+        )
+        self.load(
+            RecipeIngredient,
+            ['recipe_id', 'ingredient_id', 'amount'],
+            zip(recipes.tolist(), ingredients.tolist(), amounts.tolist())
+        )
+
+    def create_recipe_tags(self, recipe_ids, tag_ids, maximum):
+        counts = self.rng.integers(1, max(maximum, 1), len(recipe_ids),
+                                   endpoint=True)
+        recipes = np.repeat(recipe_ids, counts)
+        tags = tag_ids[self.rng.integers(0, len(tag_ids), len(recipes))]
+        recipes, tags = unique_pairs(recipes, tags, tag_ids.max() + 1)
+        self.load(
+            RecipeTag, ['recipe_id', 'tag_id'],
+            zip(recipes.tolist(), tags.tolist())
+        )
+
+    def create_user_recipe_links(self, model, user_ids, recipe_ids,
+                                 popularity, mean):
+        if not len(recipe_ids):
+            return
+        counts = long_tail(self.rng, len(user_ids), mean, sigma=1.3)
+        users = np.repeat(user_ids, counts)
+        recipes = recipe_ids[
+            self.rng.choice(len(recipe_ids), len(users), p=popularity)
+        ]
+        users, recipes = unique_pairs(users, recipes, recipe_ids.max() + 1)
+        self.load(
+            model, ['user_id', 'recipe_id'],
+            zip(users.tolist(), recipes.tolist())
+        )
+
+    def create_subscriptions(self, user_ids, authors, mean):
+        author_ids, recipe_counts = np.unique(authors, return_counts=True)
+        if not len(author_ids):
+            return
+        weights = recipe_counts * zipf_weights(self.rng, len(author_ids), 1.0)
+        counts = long_tail(self.rng, len(user_ids), mean, sigma=1.3)
+        users = np.repeat(user_ids, counts)
+        followed = author_ids[self.rng.choice(
+            len(author_ids), len(users), p=weights / weights.sum()
+        )]
+        users, followed = unique_pairs(users, followed, user_ids.max() + 1)
+        own = users == followed
+        self.load(
+            Subscription, ['user_id', 'author_id'],
+            zip(users[~own].tolist(), followed[~own].tolist())
+        )
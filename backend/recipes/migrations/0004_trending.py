@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:04
+
+import time
+
+from django.db import migrations, models
+
+
+def create_trending_state(apps, schema_editor):
+    TrendingState = apps.get_model('recipes', 'TrendingState')
+    TrendingState.objects.create(epoch=time.time())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.FloatField(verbose_name='Точка отсчёта, unix-время')),
+            ],
+            options={
+                'verbose_name': 'Состояние популярности',
+                'verbose_name_plural': 'Состояние популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, help_text='Сумма взвешенных добавлений с экспоненциальным затуханием относительно TrendingState.epoch', verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(
+            create_trending_state, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+# Поиск в админке и API идёт по префиксу: UPPER(поле) LIKE 'X%'.
+# text_pattern_ops нужен, чтобы индекс работал при любой сортировке базы.
+PREFIX_INDEXES = [
+    ('ingredient_name_upper_idx', 'recipes_ingredient', 'name'),
+    ('recipe_name_upper_idx', 'recipes_recipe', 'name'),
+]
+
+
+# Индексы по выражению с text_pattern_ops есть только в PostgreSQL;
+# SQLite для локальной проверки API обходится без них.
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON {table} '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_trending'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
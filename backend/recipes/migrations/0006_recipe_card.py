@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:43
+
+from django.conf import settings
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_admin_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('pub_date', models.DateTimeField(verbose_name='Время публикации')),
+                ('tag_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None, verbose_name='Теги')),
+                ('payload', models.JSONField(help_text='Независимая от зрителя часть ответа API о рецепте', verbose_name='Карточка')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Карточка рецепта',
+                'verbose_name_plural': 'Карточки рецептов',
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(fields=['-pub_date', '-recipe'], name='card_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(fields=['author', '-pub_date'], name='card_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='card_tag_ids_idx'),
+        ),
+    ]
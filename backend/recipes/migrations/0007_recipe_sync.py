@@ -0,0 +1,44 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecipe',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='id рецепта')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый рецепт',
+                'verbose_name_plural': 'Удалённые рецепты',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Меняется и при изменении тегов, ингредиентов и автора', verbose_name='Время изменения'),
+        ),
+        # Время изменения существующих рецептов неизвестно, берётся время
+        # публикации.
+        migrations.RunSQL(
+            'UPDATE recipes_recipe SET updated_at = pub_date',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at', 'id'], name='recipe_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedrecipe',
+            index=models.Index(fields=['deleted_at', 'recipe_id'], name='deleted_recipe_idx'),
+        ),
+    ]
@@ -2,9 +2,12 @@ from colorfield.fields import ColorField
 from const import (INGREDIENT_NAME_LENGTH, MAX_AMOUNT, MAX_COOKING_TIME,
                    MEASUREMENT_UNIT_LENGTH, MIN_AMOUNT, MIN_COOKING_TIME,
                    RECIPE_MAX_LENGTH, SLUG_MAX_LENGTH, TAG_NAME_LENGTH)
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Index, Q, UniqueConstraint
+from django.utils import timezone
 from users.models import User
 
 
@@ -114,16 +117,71 @@ class Recipe(models.Model):
         'Время публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Время изменения',
+        auto_now=True,
+        help_text='Меняется и при изменении тегов, ингредиентов и автора'
+    )
+    fanned_out = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=False
+    )
+    trending_score = models.FloatField(
+        'Популярность',
+        default=0,
+        help_text='Сумма взвешенных добавлений с экспоненциальным '
+                  'затуханием относительно TrendingState.epoch'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            Index(
+                fields=['author', '-pub_date'],
+                condition=Q(fanned_out=False),
+                name='recipe_not_fanned_out_idx'
+            ),
+            Index(
+                fields=['-trending_score', '-pub_date'],
+                name='recipe_trending_idx'
+            ),
+            Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            ),
+            Index(
+                fields=['updated_at', 'id'],
+                name='recipe_updated_at_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class DeletedRecipe(models.Model):
+    """Удалённый рецепт: по этим записям синхронизация узнаёт об
+    удалениях."""
+
+    recipe_id = models.BigIntegerField('id рецепта', primary_key=True)
+    deleted_at = models.DateTimeField('Время удаления', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+        indexes = [
+            Index(
+                fields=['deleted_at', 'recipe_id'],
+                name='deleted_recipe_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
 class RecipeIngredient(models.Model):
     """Модель связи ингредиента и рецепта."""
 
@@ -230,3 +288,102 @@ class Favorite(models.Model):
                 name='user_favorite_unique'
             )
         ]
+
+
+class TrendingState(models.Model):
+    """Точка отсчёта затухания популярности (единственная строка)."""
+
+    epoch = models.FloatField('Точка отсчёта, unix-время')
+
+    class Meta:
+        verbose_name = 'Состояние популярности'
+        verbose_name_plural = 'Состояние популярности'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Время публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_feed_recipe_unique'
+            )
+        ]
+        indexes = [
+            Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+            Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ]
+
+
+class RecipeCard(models.Model):
+    """Карточка рецепта для чтения: готовый ответ API и поля отбора.
+
+    Страница рецептов читается из одной таблицы без соединений с
+    авторами, тегами и ингредиентами. Обновляется в транзакции записи
+    рецепта, см. recipes.cards.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Время публикации')
+    tag_ids = ArrayField(
+        models.IntegerField(), default=list, verbose_name='Теги'
+    )
+    payload = models.JSONField(
+        'Карточка',
+        help_text='Независимая от зрителя часть ответа API о рецепте'
+    )
+
+    class Meta:
+        verbose_name = 'Карточка рецепта'
+        verbose_name_plural = 'Карточки рецептов'
+        ordering = ('-pub_date',)
+        indexes = [
+            Index(
+                fields=['-pub_date', '-recipe'],
+                name='card_pub_date_idx'
+            ),
+            Index(
+                fields=['author', '-pub_date'],
+                name='card_author_pub_date_idx'
+            ),
+            GinIndex(fields=['tag_ids'], name='card_tag_ids_idx'),
+        ]
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from jobs.queue import enqueue
+from users.models import Subscription, User
+
+from . import cards, feed, trending
+from .indexes import mark_recipes_dirty
+from .models import (DeletedRecipe, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, RecipeTag, ShoppingCart, Tag)
+
+TRENDING_WEIGHTS = {
+    Favorite: 'TRENDING_FAVORITE_WEIGHT',
+    ShoppingCart: 'TRENDING_CART_WEIGHT',
+}
+
+
+# Данные рецептов изменились (аргумент recipe_ids); шлётся после коммита.
+recipes_updated = Signal()
+
+
+# Поля автора, которые попадают в карточку рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def recipes_changed(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    cards.changed(recipe_ids)
+
+    def notify():
+        mark_recipes_dirty(recipe_ids)
+        recipes_updated.send(sender=Recipe, recipe_ids=recipe_ids)
+
+    transaction.on_commit(notify)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_saved_or_deleted(sender, instance, **kwargs):
+    recipes_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    DeletedRecipe.objects.bulk_create(
+        [DeletedRecipe(recipe_id=instance.pk)], ignore_conflicts=True
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: feed.fan_out(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw, **kwargs):
+    if raw or not instance.image:
+        return
+    # Ключ не даёт поставить задачу повторно при сохранении рецепта без
+    # смены изображения.
+    enqueue(
+        'recipes.process_image',
+        {'recipe_id': instance.pk, 'name': instance.image.name},
+        key=f'recipe-image:{instance.pk}:{instance.image.name}'
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: feed.backfill(instance.user_id, instance.author_id)
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: feed.remove(instance.user_id, instance.author_id)
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def recipe_relation_changed(sender, instance, **kwargs):
+    recipes_changed([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=RecipeTag)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipes_changed([instance.pk])
+    elif pk_set:
+        recipes_changed(pk_set)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    # Вход пользователя сохраняет только last_login.
+    if created or update_fields is not None and not (
+        AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    recipes_changed(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        cards.changed(RecipeTag.objects.filter(
+            tag=instance
+        ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        cards.changed(RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_added(sender, instance, created, **kwargs):
+    if created:
+        trending.record(
+            instance.recipe_id, getattr(settings, TRENDING_WEIGHTS[sender])
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_removed(sender, instance, **kwargs):
+    trending.record(
+        instance.recipe_id, -getattr(settings, TRENDING_WEIGHTS[sender])
+    )
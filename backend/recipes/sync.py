@@ -0,0 +1,132 @@
+"""Инкрементальная синхронизация каталога рецептов.
+
+Клиент хранит курсор и забирает только то, что изменилось после него:
+удаления из DeletedRecipe по (deleted_at, recipe_id) и изменённые
+рецепты по (updated_at, id). Каждая выборка — один просмотр диапазона
+своего индекса, поэтому синхронизация за день без изменений стоит два
+коротких просмотра индекса.
+
+Выборки ограничены горизонтом ``now - SYNC_LAG``: updated_at ставится
+до фиксации транзакции, и запись, зафиксированная позже, не должна
+оказаться позади уже выданного курсора.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DeletedRecipe, Recipe
+
+
+class Cursor:
+    """Позиция синхронизации.
+
+    ``deleted`` — удаления до этого момента включительно уже выданы
+    (None — первая синхронизация, удаления не нужны). ``updated`` —
+    последний выданный рецепт (updated_at, id); id None означает, что
+    выданы все рецепты до updated_at включительно.
+    """
+
+    def __init__(self, deleted=None, updated=None):
+        self.deleted = deleted
+        self.updated = updated
+
+    def encode(self):
+        data = {
+            'd': self.deleted and self.deleted.isoformat(),
+            'u': self.updated and [
+                self.updated[0].isoformat(), self.updated[1]
+            ],
+        }
+        return base64.urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode()
+        ).decode()
+
+    @classmethod
+    def decode(cls, encoded):
+        """Курсор из строки; ValueError, если строка не курсор."""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            deleted = updated = None
+            if data['d'] is not None:
+                deleted = parse_datetime(data['d'])
+                if deleted is None:
+                    raise ValueError(encoded)
+            if data['u'] is not None:
+                moment, recipe_id = data['u']
+                updated = parse_datetime(moment), recipe_id
+                if updated[0] is None or recipe_id is not None and (
+                    not isinstance(recipe_id, int)
+                ):
+                    raise ValueError(encoded)
+        except (TypeError, KeyError, AttributeError) as error:
+            raise ValueError(encoded) from error
+        return cls(deleted, updated)
+
+
+def horizon():
+    return timezone.now() - timedelta(seconds=settings.SYNC_LAG)
+
+
+def expired(cursor):
+    """Удаления после курсора могли быть уже вычищены purge_deleted."""
+    return cursor.deleted is not None and cursor.deleted < (
+        timezone.now() - timedelta(seconds=settings.SYNC_RETENTION)
+    )
+
+
+def chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == settings.SYNC_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def deleted(cursor, until):
+    """Пачки [(recipe_id, deleted_at), ...] удалённых после курсора до
+    until."""
+    if cursor.deleted is None:
+        return iter(())
+    return chunked(DeletedRecipe.objects.filter(
+        deleted_at__gt=cursor.deleted, deleted_at__lte=until
+    ).order_by('deleted_at', 'recipe_id').values_list(
+        'recipe_id', 'deleted_at'
+    ).iterator(chunk_size=settings.SYNC_CHUNK_SIZE))
+
+
+def updated(cursor, until):
+    """Пачки [(id, updated_at), ...] изменённых после курсора до until.
+
+    Строки читаются серверным курсором, в памяти одна пачка.
+    """
+    queryset = Recipe.objects.filter(updated_at__lte=until)
+    if cursor.updated is not None:
+        moment, recipe_id = cursor.updated
+        if recipe_id is None:
+            queryset = queryset.filter(updated_at__gt=moment)
+        else:
+            queryset = queryset.filter(
+                Q(updated_at__gt=moment) | Q(id__gt=recipe_id),
+                updated_at__gte=moment
+            )
+    return chunked(queryset.order_by('updated_at', 'id').values_list(
+        'id', 'updated_at'
+    ).iterator(chunk_size=settings.SYNC_CHUNK_SIZE))
+
+
+def purge_deleted():
+    """Удаляет записи об удалениях старше SYNC_RETENTION."""
+    count, _ = DeletedRecipe.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(
+            seconds=settings.SYNC_RETENTION
+        )
+    ).delete()
+    return count
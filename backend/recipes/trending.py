@@ -0,0 +1,79 @@
+import math
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Exp, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart, TrendingState
+
+
+def count_of(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def decay_rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def record(recipe_id, weight):
+    """Прибавляет к популярности рецепта событие веса weight.
+
+    Счёт хранится умноженным на exp(rate * (t - epoch)), поэтому
+    порядок рецептов не зависит от момента чтения, а событие обновляет
+    одну строку одним UPDATE без чтения. Отрицательный вес (удаление
+    из избранного или корзины) вычитается по текущему времени. Пока
+    строки TrendingState нет, точкой отсчёта считается текущий момент.
+    """
+    rate = decay_rate()
+    now = time.time()
+    epoch = Coalesce(
+        Subquery(TrendingState.objects.values('epoch')[:1]), Value(now)
+    )
+    increment = Value(weight) * Exp(
+        Value(rate * now) - Value(rate) * epoch
+    )
+    Recipe.objects.filter(pk=recipe_id).update(
+        trending_score=Greatest(F('trending_score') + increment, Value(0.0))
+    )
+
+
+@transaction.atomic
+def renormalize(rebuild=False):
+    """Переносит точку отсчёта на текущий момент.
+
+    Все счета умножаются на exp(-rate * сдвиг), чтобы не переполнялся
+    множитель новых событий; совсем малые обнуляются. С rebuild счета
+    пересчитываются из текущих Favorite/ShoppingCart так, будто все
+    добавления случились сейчас.
+    """
+    now = time.time()
+    state = TrendingState.objects.select_for_update().first()
+    if state is None:
+        # Строку могли удалить (например, при очистке базы); без неё
+        # record пишет события без множителя, как при epoch = now.
+        state, _ = TrendingState.objects.get_or_create(
+            pk=1, defaults={'epoch': now}
+        )
+    if rebuild:
+        Recipe.objects.update(
+            trending_score=count_of(Favorite)
+            * settings.TRENDING_FAVORITE_WEIGHT
+            + count_of(ShoppingCart) * settings.TRENDING_CART_WEIGHT
+        )
+    else:
+        factor = math.exp(-decay_rate() * (now - state.epoch))
+        Recipe.objects.filter(trending_score__gt=0).update(
+            trending_score=F('trending_score') * factor
+        )
+        Recipe.objects.filter(
+            trending_score__gt=0,
+            trending_score__lt=settings.TRENDING_MIN_SCORE
+        ).update(trending_score=0)
+    state.epoch = now
+    state.save(update_fields=['epoch'])
@@ -1,22 +1,23 @@
 from django.contrib import admin
+from foodgram_backend.admin import ScalableAdmin
 from users.models import Subscription, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name']
-    search_fields = ['username', 'email']
-    list_filter = ['username', 'email']
+    search_fields = ['^username', '^email']
+    list_filter = ['is_staff', 'is_active']
     ordering = ['username']
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ScalableAdmin, admin.ModelAdmin):
     list_display = ['user', 'author']
     search_fields = [
-        'author__username',
-        'author__email',
-        'user__username',
-        'user__email'
+        '^author__username',
+        '^author__email',
+        '^user__username',
+        '^user__email'
     ]
-    list_filter = ['author__username', 'user__username']
+    autocomplete_fields = ['user', 'author']
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+# Поиск в админке и API идёт по префиксу: UPPER(поле) LIKE 'X%'.
+# text_pattern_ops нужен, чтобы индекс работал при любой сортировке базы.
+PREFIX_INDEXES = [
+    ('user_username_upper_idx', 'users_user', 'username'),
+    ('user_email_upper_idx', 'users_user', 'email'),
+]
+
+
+# Индексы по выражению с text_pattern_ops есть только в PostgreSQL;
+# SQLite для локальной проверки API обходится без них.
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON {table} '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username'], name='user_username_idx'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -2,7 +2,7 @@ from const import (EMAIL_LENGTH, FIRST_NAME_LENGTH, LAST_NAME_LENGTH,
                    USERNAME_LENGTH)
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Index, UniqueConstraint
 
 from .validators import validate_username
 
@@ -35,6 +35,9 @@ class User(AbstractUser):
 
     class Meta:
         ordering = ('-pk',)
+        indexes = [
+            Index(fields=['username'], name='user_username_idx'),
+        ]
 
     def __str__(self):
         return self.username
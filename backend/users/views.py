@@ -1,51 +1,50 @@
+from api.mixins import MultiGetMixin
 from api.pagination import CustomPagination
-from api.serializers import CustomUserSerializer, SubscriptionSerializer
-from django.shortcuts import get_object_or_404
+from api.serializers import (CustomUserSerializer, SubscriptionSerializer,
+                             requested_fields)
+from api.views import subscribe_to, unsubscribe_from
 from djoser.views import UserViewSet
-from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
 
-from .models import Subscription, User
+from .models import User
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(MultiGetMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
 
-    @staticmethod
-    def process_subscription(request, author):
-        user = request.user
-        if not Subscription.objects.filter(user=user, author=author).exists():
-            serializer = SubscriptionSerializer(
-                data={'user': user.id, 'author': author.id},
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(
-            {'detail': 'Подписка уже существует.'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = self.requested_fields()
+        if fields is not None:
+            # is_subscribed — не колонка, но для него нужен id.
+            queryset = queryset.only(*(fields - {'is_subscribed'} | {'id'}))
+        return queryset
+
+    def requested_fields(self):
+        if self.action not in ('list', 'retrieve', 'me') \
+                or self.request.method != 'GET':
+            return None
+        return requested_fields(self.request, CustomUserSerializer)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields()
+        return context
 
     @action(
         detail=True, methods=['POST'], permission_classes=[IsAuthenticated]
     )
     def subscribe(self, request, **kwargs):
-        author = get_object_or_404(User, id=self.kwargs.get('id'))
-        return self.process_subscription(request, author)
+        return subscribe_to(request, self.kwargs.get('id'))
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, **kwargs):
-        author = get_object_or_404(User, id=self.kwargs.get('id'))
-        subscription = get_object_or_404(
-            Subscription, user=request.user, author=author
-        )
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return unsubscribe_from(request, self.kwargs.get('id'))
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):